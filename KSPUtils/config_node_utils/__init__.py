@@ -1,6 +1,8 @@
 from .config_node import ConfigNode
-from .named_object import NamedObject
+from .named_object import LoadOptions, NamedObject
 from .objects import Module, Part, Resource
+from .part_index import PartIndex
+from .tokenizer import StringTable
 from .value_collection import ValueCollection
 
 __all__ = [
@@ -9,5 +11,8 @@ __all__ = [
     "Module",
     "Resource",
     "NamedObject",
+    "LoadOptions",
+    "PartIndex",
+    "StringTable",
     "ValueCollection",
 ]
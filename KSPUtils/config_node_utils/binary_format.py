@@ -0,0 +1,175 @@
+import sys
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+)
+
+from KSPUtils.config_node_utils.tokenizer import StringTable
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+if TYPE_CHECKING:
+    from KSPUtils.config_node_utils.config_node import ConfigNode
+
+ConfigNodeType = TypeVar("ConfigNodeType", bound="ConfigNode")
+_Sliceable = TypeVar("_Sliceable", str, bytes)
+
+MAGIC = b"KSPCN\x01"
+_header_size = len(MAGIC) + 8
+
+
+class BinaryFormatError(ValueError):
+    """Data is not a valid binary ConfigNode"""
+
+
+def _uint32_array() -> array:
+    for typecode in ("I", "L"):
+        arr = array(typecode)
+        if arr.itemsize == 4:
+            return arr
+    raise RuntimeError("No 4-byte unsigned integer array type")
+
+
+def _to_le_bytes(arr: array) -> bytes:
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le_bytes(data: bytes) -> array:
+    arr = _uint32_array()
+    arr.frombytes(data)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def dump(node: "ConfigNode", stream: BinaryIO) -> None:
+    """
+    Writes the node tree to the binary stream.
+
+    The format is: MAGIC; the number of strings and of tree integers;
+    the byte length of every string; the UTF-8 encoded strings;
+    the tree itself as a pre-order sequence of little-endian uint32:
+    name, number of values, (name, value, comment) of every value,
+    number of subnodes, subnodes. Every string is stored only once
+    and is referenced by its number.
+    """
+    ids: Dict[str, int] = {}
+    tree = _uint32_array()
+
+    def string_id(string: str) -> int:
+        idx = ids.get(string)
+        if idx is None:
+            idx = ids[string] = len(ids)
+        return idx
+
+    def add_node(n: "ConfigNode") -> None:
+        tree.append(string_id(n.name))
+        tree.append(len(n.values))
+        for value in n.values:
+            tree.append(string_id(value.name))
+            tree.append(string_id(str(value.value)))
+            tree.append(string_id(str(value.comment)))
+        tree.append(len(n.subnodes))
+        for subnode in n.subnodes:
+            add_node(subnode)
+
+    add_node(node)
+    encoded = [string.encode("utf8") for string in ids]
+    lengths = _uint32_array()
+    lengths.extend(len(string) for string in encoded)
+    counts = _uint32_array()
+    counts.extend((len(encoded), len(tree)))
+    stream.write(MAGIC)
+    stream.write(_to_le_bytes(counts))
+    stream.write(_to_le_bytes(lengths))
+    stream.write(b"".join(encoded))
+    stream.write(_to_le_bytes(tree))
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise BinaryFormatError("Unexpected end of data")
+    return data
+
+
+def _split(source: _Sliceable, lengths: array) -> List[_Sliceable]:
+    strings = []
+    start = 0
+    for length in lengths:
+        end = start + length
+        strings.append(source[start:end])
+        start = end
+    return strings
+
+
+def _read_strings(stream: BinaryIO, num_strings: int) -> List[str]:
+    lengths = _from_le_bytes(_read_exactly(stream, num_strings * 4))
+    blob = _read_exactly(stream, sum(lengths))
+    text = blob.decode("utf8")
+    # in pure ASCII the byte offsets are the character offsets,
+    # so the blob is decoded once instead of string by string
+    if len(text) == len(blob):
+        return _split(text, lengths)
+    return [string.decode("utf8") for string in _split(blob, lengths)]
+
+
+def load(
+    stream: BinaryIO,
+    node_type: Type[ConfigNodeType],
+    strings: Optional[StringTable] = None,
+) -> ConfigNodeType:
+    """
+    Reads a node tree written by `dump` from the binary stream.
+
+    Most of the time of loading a big tree is spent by the garbage
+    collector, which runs many times over the objects being created,
+    though the tree has no reference cycles. The collector is global to
+    the process, so it is not paused here; a caller loading many trees
+    can disable it for the time itself.
+
+    :param strings: if given, the values are shared through it,
+        e.g. with the trees loaded before; node names and value keys
+        are always interned, like by the tokenizers
+    """
+    header = stream.read(_header_size)
+    if len(header) != _header_size or not header.startswith(MAGIC):
+        raise BinaryFormatError("Not a binary ConfigNode")
+    num_strings, tree_size = _from_le_bytes(header[len(MAGIC) :])
+    table = _read_strings(stream, num_strings)
+    if strings is not None:
+        table = [strings(string) for string in table]
+    tree = _from_le_bytes(_read_exactly(stream, tree_size * 4))
+    next_int: Callable[[], int] = iter(tree).__next__
+    Value = ValueCollection.Value
+    intern = sys.intern
+
+    # the nodes are new, so their values and subnodes are added directly
+    # instead of through AddValue and AddNode, like in ConfigNode._build
+    def read_node(n: "ConfigNode") -> None:
+        values = n.values
+        for _i in range(next_int()):
+            key = intern(table[next_int()])
+            value = Value(key, table[next_int()], table[next_int()])
+            values.add(key, value)
+        subnodes = n.subnodes
+        for _i in range(next_int()):
+            name = intern(table[next_int()])
+            subnode = node_type(name)
+            subnodes.add(name, subnode)
+            read_node(subnode)
+
+    try:
+        root = node_type(intern(table[next_int()]))
+        read_node(root)
+    except (IndexError, StopIteration) as exc:
+        raise BinaryFormatError("Corrupted binary ConfigNode") from exc
+    return root
@@ -1,8 +1,63 @@
-from copy import deepcopy
-from typing import List, Optional, Union
+import mmap
+import os
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
+from KSPUtils.config_node_utils import binary_format
 from KSPUtils.config_node_utils.list_dict import ListDict
-from KSPUtils.config_node_utils.value_collection import ValueCollection
+from KSPUtils.config_node_utils.tokenizer import (
+    DEFERRED,
+    OPEN,
+    VALUE,
+    DeferredNode,
+    StringTable,
+    Token,
+    tokenize,
+    tokenize_buffer,
+    tokenize_lazy,
+)
+from KSPUtils.config_node_utils.value_collection import ValueCollection, _write_lines
+from KSPUtils.info_extractors.file_extractor import StrPath
+
+if TYPE_CHECKING:
+    from KSPUtils.config_node_utils.parse_cache import ParseCache
+
+ParseEvent = Tuple[str, Any]
+
+
+def _stream_lines(stream: Iterable[str]) -> Iterator[str]:
+    for chunk in stream:
+        yield from chunk.splitlines()
+
+
+def _add_deferred(
+    subnodes: ListDict["ConfigNode"], deferred: Iterable[DeferredNode]
+) -> None:
+    """Parses the deferred nodes and adds them to the subnodes"""
+    for d in deferred:
+        node = ConfigNode(d.name)
+        # pylint: disable=protected-access
+        node._build(tokenize(d.lines(), d.strings))
+        subnodes.add(node.name, node)
+
+
+def _shared_copy(node: "ConfigNode") -> "ConfigNode":
+    copy = node.__class__()
+    copy.Clone(node)
+    return copy
 
 
 class ConfigNode(ValueCollection):
@@ -10,18 +65,77 @@ class ConfigNode(ValueCollection):
     Simple KSP ConfigNode reader/writer
     """
 
+    __slots__ = ("_subnodes", "_deferred", "_shared_nodes", "name")
+
     def __init__(self, name=""):
         ValueCollection.__init__(self)
-        self.subnodes: ListDict[ConfigNode] = ListDict()
+        self._subnodes: ListDict[ConfigNode] = ListDict()
+        self._deferred: Optional[List[DeferredNode]] = None
+        # the subnodes still shared with the clones, by id;
+        # they are kept alive here, so that their ids are not reused
+        self._shared_nodes: Optional[Dict[int, ConfigNode]] = None
         self.name = name
 
+    @property
+    def subnodes(self) -> ListDict["ConfigNode"]:
+        if self._deferred is not None:
+            self._parse_deferred()
+        return self._subnodes
+
+    @subnodes.setter
+    def subnodes(self, subnodes: ListDict["ConfigNode"]) -> None:
+        self._changed()
+        self._subnodes = subnodes
+        self._deferred = None
+        self._shared_nodes = None
+
+    @property
+    def parsed(self) -> bool:
+        """False if the subnodes of a lazily parsed node are not parsed yet"""
+        return self._deferred is None
+
+    def _parse_deferred(self) -> None:
+        deferred, self._deferred = self._deferred, None
+        _add_deferred(self._subnodes, deferred or ())
+
     def Clone(self, other: "ConfigNode") -> None:
+        """
+        Makes this node a copy of the other. The copy shares the values and
+        the subnodes with the original, copying them only when either node
+        is changed: the values by AddValue, SetValue and the like, the list
+        of the subnodes by AddNode and RemoveNode, and each subnode when it
+        is handed out by GetNode or GetNodes to be changed. Values and nodes
+        reached directly through the `values` and `subnodes` attributes,
+        GetValues and [] are still shared, so they should only be read.
+        """
         ValueCollection.Clone(self, other)
-        self.subnodes = deepcopy(other.subnodes)
+        # the deferred subnodes are parsed separately by each node
+        self._subnodes = other._subnodes.share()
+        self._deferred = other._deferred
+        self._shared_nodes = None
         self.name = other.name
 
+    def _own_subnodes(self) -> None:
+        """
+        Gives the node its own list of the subnodes; the subnodes in it
+        are still shared with the clones until _own_subnode copies them.
+        """
+        subnodes = self.subnodes
+        if subnodes.shared:
+            self._shared_nodes = {id(n): n for n in subnodes}
+            self._subnodes = subnodes.copy()
+
+    def _own_subnode(self, node: "ConfigNode") -> "ConfigNode":
+        """Replaces the subnode with its copy, if it is shared with the clones"""
+        shared = self._shared_nodes
+        if not shared or shared.pop(id(node), None) is None:
+            return node
+        copy = _shared_copy(node)
+        self._subnodes.replace(node.name, node, copy)
+        return copy
+
     def __bool__(self):
-        return bool(self.values) or bool(self.subnodes)
+        return bool(self.values) or bool(self._subnodes) or bool(self._deferred)
 
     def AddNode(self, node: Union["ConfigNode", str]) -> "ConfigNode":
         if isinstance(node, str):
@@ -30,119 +144,239 @@ class ConfigNode(ValueCollection):
             new_node = node
         else:
             raise ValueError("node should be either a string or ConfigNode object")
+        self._changed()
+        self._own_subnodes()
         self.subnodes.add(new_node.name, new_node)
         return new_node
 
     def GetNode(self, name: str, idx=0) -> Optional["ConfigNode"]:
-        return self.subnodes.get(name, idx)
+        self._own_subnodes()
+        node = self.subnodes.get(name, None, idx)
+        return self._own_subnode(node) if node is not None else None
 
     def GetNodes(self, name: str) -> List["ConfigNode"]:
-        return self.subnodes.get_all(name)
+        self._own_subnodes()
+        return [self._own_subnode(node) for node in self.subnodes.get_all(name)]
+
+    def RemoveNode(self, name: str, idx=0) -> None:
+        self._changed()
+        self._own_subnodes()
+        node = self.subnodes.pop(name, idx, None)
+        if node is not None and self._shared_nodes:
+            self._shared_nodes.pop(id(node), None)
 
     def HasNode(self, name: str) -> bool:
         return name in self.subnodes
 
-    def Parse(self, text: str) -> None:
+    def Parse(
+        self, text: str, lazy=False, strings: Optional[StringTable] = None
+    ) -> None:
+        """
+        :param text: ConfigNode text
+        :param lazy: if True, the subnodes of the top-level nodes are only
+            parsed when they are accessed for the first time
+        :param strings: if given, equal short values share the same string
+            through it; node names and value keys are always interned
+        """
+        lines = text.splitlines()
+        tokenizer = tokenize_lazy if lazy else tokenize
+        self._parse_tokens(tokenizer(lines, strings))
+
+    def _parse_tokens(self, tokens: Iterable[Token]) -> None:
+        self._changed()
         self.values = ListDict()
         self.subnodes = ListDict()
-        lines = self._preformat(text.splitlines())
-        self._parse(lines, self)
+        self._build(tokens)
         if len(self.values) == 0 and len(self.subnodes) == 1:
+            # adopt the only top-level node as the root
             node = self.subnodes[0]
             if node is not None:
-                self.Clone(node)
+                self.values = node.values
+                self._subnodes = node._subnodes
+                self._deferred = node._deferred
+                self.name = node.name
+
+    @classmethod
+    def FromText(
+        cls, text: str, lazy=False, strings: Optional[StringTable] = None
+    ) -> "ConfigNode":
+        node = cls()
+        node.Parse(text, lazy, strings)
+        return node
+
+    @classmethod
+    def Load(
+        cls,
+        filename: str,
+        cache: Optional["ParseCache"] = None,
+        lazy=False,
+        strings: Optional[StringTable] = None,
+    ) -> "ConfigNode":
+        """
+        :param filename: path to the file
+        :param cache: if given, the parsed file is taken from or put into it
+        :param lazy: same as in Parse; ignored when the cache is used,
+            as the cached tree is always complete
+        :param strings: same as in Parse
+        """
+        try:
+            if cache is not None:
+                return cache.load(
+                    filename,
+                    partial(cls._load, strings=strings),
+                    ConfigNode.dump_binary,
+                    partial(cls.load_binary, strings=strings),
+                )
+            if lazy:
+                return cls._load_lazy(filename, strings)
+            return cls._load(filename, strings)
+        except Exception as exc:
+            print(f"Unable to parse {filename}: {exc!s}")
+            return cls()
+
+    @classmethod
+    def _load(
+        cls, filename: str, strings: Optional[StringTable] = None
+    ) -> "ConfigNode":
+        node = cls()
+        with open(filename, encoding="utf8") as inp:
+            node._parse_tokens(tokenize(_stream_lines(inp), strings))
+        return node
 
     @classmethod
-    def FromText(cls, text: str) -> "ConfigNode":
+    def _load_lazy(
+        cls, filename: str, strings: Optional[StringTable] = None
+    ) -> "ConfigNode":
         node = cls()
-        node.Parse(text)
+        with open(filename, encoding="utf8") as inp:
+            node._parse_tokens(tokenize_lazy(inp.read().splitlines(), strings))
         return node
 
     @classmethod
-    def Load(cls, filename: str) -> "ConfigNode":
+    def LoadMapped(cls, filename: StrPath) -> "ConfigNode":
+        """
+        Same as Load, but the file is memory-mapped and scanned as bytes.
+        Values keep copies of their raw bytes and are only decoded when
+        accessed, see MappedValue; the mapping is closed as soon as
+        the file is parsed.
+        """
         node = cls()
         try:
-            with open(filename, encoding="utf8") as inp:
-                node.Parse(inp.read())
+            with open(filename, "rb") as inp:
+                if os.fstat(inp.fileno()).st_size == 0:
+                    return node
+                with mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    node._parse_tokens(tokenize_buffer(buffer))
         except Exception as exc:
             print(f"Unable to parse {filename}: {exc!s}")
+            node = cls()
         return node
 
+    @classmethod
+    def iterparse(
+        cls,
+        source: Union[StrPath, TextIO],
+        nodes: Optional[Collection[str]] = None,
+        strings: Optional[StringTable] = None,
+    ) -> Iterator[ParseEvent]:
+        """
+        Parses a file or a text stream incrementally, yielding parse events:
+
+        ("start", node_name) when a node is opened,
+        ("value", ValueCollection.Value) for every value,
+        ("end", node_name) when a node is closed,
+        ("node", ConfigNode) for every node whose name is in `nodes`.
+
+        Nodes listed in `nodes` are built completely, and no events are
+        generated for their contents. Unlike Parse, the single top-level node
+        is not adopted as the root, so the events reflect the file as is.
+
+        :param source: path to a file or a text stream to read from
+        :param nodes: names of the nodes to be yielded as whole ConfigNodes
+        :param strings: same as in Parse
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, encoding="utf8") as inp:
+                yield from cls._iterparse(inp, nodes, strings)
+        else:
+            yield from cls._iterparse(source, nodes, strings)
+
+    @classmethod
+    def _iterparse(
+        cls,
+        stream: TextIO,
+        nodes: Optional[Collection[str]],
+        strings: Optional[StringTable],
+    ) -> Iterator[ParseEvent]:
+        tokens = tokenize(_stream_lines(stream), strings)
+        names: List[str] = []
+        for kind, payload in tokens:
+            if kind == VALUE:
+                yield "value", payload
+            elif kind == OPEN:
+                if nodes and payload in nodes:
+                    node = cls(payload)
+                    node._build(tokens)
+                    yield "node", node
+                else:
+                    names.append(payload)
+                    yield "start", payload
+            else:
+                yield "end", names.pop()
+
     def Save(self, filename: str) -> None:
         with open(filename, "w", encoding="utf8") as out:
-            out.write(str(self).strip("\n\r"))
+            lines = self.iter_lines()
+            if not self.name:
+                next(lines)
+            _write_lines(out, lines)
+
+    def dump_binary(self, stream: BinaryIO) -> None:
+        """
+        Writes the node to the binary stream in a compact format
+        that loads much faster than the text; see binary_format.dump.
+        """
+        binary_format.dump(self, stream)
 
     @classmethod
-    def _parse(cls, lines: List[List[str]], node: "ConfigNode", index=0) -> int:
-        nlines = len(lines)
-        while index < nlines:
-            line = lines[index]
-            if len(line) == 2:
-                node.AddValue(*line)
-                index += 1
-            elif line[0] == "{":
-                subnode = node.AddNode("")
-                index = cls._parse(lines, subnode, index + 1)
-            else:
-                if line[0] == "}":
-                    return index + 1
-                if index < nlines - 1 and lines[index + 1][0] == "{":
-                    subnode = node.AddNode(line[0].strip(" \t\xef\xbb\xbf\ufeff"))
-                    index = cls._parse(lines, subnode, index + 2)
-                else:
-                    index += 1
-        return index
+    def load_binary(
+        cls, stream: BinaryIO, strings: Optional[StringTable] = None
+    ) -> "ConfigNode":
+        """
+        Reads a node written by dump_binary.
 
-    @staticmethod
-    def _split_by(sym: str, line_num: int, lines: List[str]) -> int:
-        line = lines[line_num]
-        try:
-            idx = line.index(sym)
-            if idx == 0 and len(line) == 1:
-                return line_num
-            if idx > 0:
-                lines.insert(line_num, line[:idx])
-                line = line[idx:]
-                line_num += 1
-                idx = 0
-                lines[line_num] = line
-            if idx < len(line) - 1:
-                lines.insert(line_num + 1, line[1:])
-                lines[line_num] = sym
-                line_num = min(len(lines) - 1, line_num + 2)
-        except ValueError:
-            pass
-        return line_num
-
-    def _preformat(self, lines: List[str]) -> List[List[str]]:
-        num_lines = len(lines)
-        while num_lines > 0:
-            num_lines -= 1
-            line = lines[num_lines].strip()
-            try:
-                idx = line.index("//")
-                if idx == 0:
-                    del lines[num_lines]
-                    continue
-                if idx > 0:
-                    line = line[:idx]
-            except ValueError:
-                pass
-            line = line.strip()
-            if not line:
-                del lines[num_lines]
-                continue
-            lines[num_lines] = line
-            num_lines = self._split_by("}", num_lines, lines)
-            num_lines = self._split_by("{", num_lines, lines)
-        return [[w.strip() for w in line.split("=")] for line in lines]
-
-    def __str__(self):
-        name = f"{self.name}\n{{\n"
-        values = "\n".join(f"    {value}" for value in self.values)
-        nodes = "\n".join(
-            f"    {line}" for node in self.subnodes for line in str(node).splitlines()
-        )
-        if values and nodes:
-            values += "\n"
-        return "".join((name, values, nodes, "\n}"))
+        :param strings: if given, the strings are shared through it
+        """
+        return binary_format.load(stream, cls, strings)
+
+    def _node_name(self) -> str:
+        return self.name
+
+    def _node_children(self) -> ListDict["ConfigNode"]:
+        return self.subnodes
+
+    def _build(self, tokens: Iterable[Token]) -> None:
+        """
+        Adds the nodes and values from the tokens to this node,
+        until the token that closes this node.
+        The node should not share its values and subnodes, as they
+        are added directly, not as changes of the node.
+        """
+        node = self
+        stack: List[ConfigNode] = []
+        for kind, payload in tokens:
+            if kind == VALUE:
+                node.values.add(payload.name, payload)
+            elif kind == OPEN:
+                stack.append(node)
+                subnode = ConfigNode(payload)
+                node._subnodes.add(payload, subnode)
+                node = subnode
+            elif kind == DEFERRED:
+                if node._deferred is None:
+                    node._deferred = []
+                node._deferred.append(payload)
+            elif stack:
+                node = stack.pop()
+            else:
+                return
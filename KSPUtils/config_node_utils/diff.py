@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+# the type and the name of a node, and its number among the nodes
+# with the same type and name
+NodeKey = Tuple[str, Optional[str], int]
+
+
+@dataclass
+class ValueChange:
+    """A value that was added (old is None), removed (new is None) or changed"""
+
+    name: str
+    # the number of the value among the values with the same name
+    index: int
+    old: Optional[Any]
+    new: Optional[Any]
+
+
+@dataclass
+class NodeDiff:
+    """The differences between two versions of a node"""
+
+    old: ValueCollection
+    new: ValueCollection
+    label: str
+    values: List[ValueChange] = field(default_factory=list)
+    added: List[ValueCollection] = field(default_factory=list)
+    removed: List[ValueCollection] = field(default_factory=list)
+    changed: List["NodeDiff"] = field(default_factory=list)
+
+
+@dataclass
+class Diff:
+    """The differences between two sets of nodes, e.g. of all the parts"""
+
+    added: List[ValueCollection] = field(default_factory=list)
+    removed: List[ValueCollection] = field(default_factory=list)
+    changed: List[NodeDiff] = field(default_factory=list)
+    unchanged: int = 0
+
+
+def _node_children(node: ValueCollection) -> Iterable[ValueCollection]:
+    # the children of the views are compared without creating them
+    # pylint: disable=protected-access
+    return node._node_children()
+
+
+def _type_name(node: ValueCollection) -> Tuple[str, Optional[str]]:
+    # pylint: disable=protected-access
+    return node._node_name(), node.GetValue("name")
+
+
+def _keyed(nodes: Iterable[ValueCollection]) -> Dict[NodeKey, ValueCollection]:
+    keyed: Dict[NodeKey, ValueCollection] = {}
+    counts: Dict[Tuple[str, Optional[str]], int] = {}
+    for node in nodes:
+        type_name = _type_name(node)
+        count = counts.get(type_name, 0)
+        counts[type_name] = count + 1
+        keyed[type_name + (count,)] = node
+    return keyed
+
+
+def node_label(key: NodeKey) -> str:
+    """
+    The ModuleManager-like name of the node with the key: TYPE[name],
+    followed by ",N" if there are several nodes with the same name.
+    """
+    type_name, name, count = key
+    label = type_name if name is None else f"{type_name}[{name}]"
+    if count:
+        label += f",{count}"
+    return label
+
+
+def object_label(node: ValueCollection) -> str:
+    """The node label without the number, see node_label"""
+    return node_label(_type_name(node) + (0,))
+
+
+def _value_changes(old: ValueCollection, new: ValueCollection) -> List[ValueChange]:
+    old_values: Dict[str, List[Any]] = {}
+    for value in old.values:
+        old_values.setdefault(value.name, []).append(value.value)
+    new_values: Dict[str, List[Any]] = {}
+    for value in new.values:
+        new_values.setdefault(value.name, []).append(value.value)
+    changes = []
+    for name, old_list in old_values.items():
+        new_list = new_values.get(name, ())
+        if old_list == new_list:
+            continue
+        for idx in range(max(len(old_list), len(new_list))):
+            old_value = old_list[idx] if idx < len(old_list) else None
+            new_value = new_list[idx] if idx < len(new_list) else None
+            if old_value != new_value:
+                changes.append(ValueChange(name, idx, old_value, new_value))
+    for name, new_list in new_values.items():
+        if name not in old_values:
+            changes.extend(
+                ValueChange(name, idx, None, value)
+                for idx, value in enumerate(new_list)
+            )
+    return changes
+
+
+def _diff_keyed(
+    old: Dict[NodeKey, ValueCollection],
+    new: Dict[NodeKey, ValueCollection],
+    added: List[ValueCollection],
+    removed: List[ValueCollection],
+    changed: List[NodeDiff],
+) -> int:
+    unchanged = 0
+    for key, new_node in new.items():
+        old_node = old.get(key)
+        if old_node is None:
+            added.append(new_node)
+            continue
+        node_diff = diff_nodes(old_node, new_node, node_label(key))
+        if node_diff is None:
+            unchanged += 1
+        else:
+            changed.append(node_diff)
+    removed.extend(node for key, node in old.items() if key not in new)
+    return unchanged
+
+
+def diff_nodes(
+    old: ValueCollection, new: ValueCollection, label: str = ""
+) -> Optional[NodeDiff]:
+    """
+    Compares two versions of a node.
+    The children are matched by their type and name, see node_label;
+    the children with equal structural hashes are not compared further.
+
+    :return: None if the nodes are the same, up to the comments
+    """
+    if old.structural_hash() == new.structural_hash():
+        return None
+    node_diff = NodeDiff(old, new, label, _value_changes(old, new))
+    _diff_keyed(
+        _keyed(_node_children(old)),
+        _keyed(_node_children(new)),
+        node_diff.added,
+        node_diff.removed,
+        node_diff.changed,
+    )
+    return node_diff
+
+
+def diff(old: Iterable[ValueCollection], new: Iterable[ValueCollection]) -> Diff:
+    """
+    Compares two sets of nodes, e.g. the parts of two versions
+    of a GameData folder, matching them by their type and name.
+    """
+    result = Diff()
+    result.unchanged = _diff_keyed(
+        _keyed(old), _keyed(new), result.added, result.removed, result.changed
+    )
+    return result
+
+
+def iter_report(node_diff: NodeDiff, indent="") -> Iterator[str]:
+    """
+    Yields the lines of a human-readable description of the node changes:
+    "+" marks the added values and nodes, "-" the removed ones
+    and "~" the changed ones.
+    """
+    for change in node_diff.values:
+        name = change.name if not change.index else f"{change.name},{change.index}"
+        if change.old is None:
+            yield f"{indent}+ {name} = {change.new}"
+        elif change.new is None:
+            yield f"{indent}- {name} = {change.old}"
+        else:
+            yield f"{indent}~ {name} = {change.old} -> {change.new}"
+    for sign, nodes in (("+", node_diff.added), ("-", node_diff.removed)):
+        for node in nodes:
+            yield f"{indent}{sign} {object_label(node)}"
+    for child in node_diff.changed:
+        yield f"{indent}~ {child.label}"
+        yield from iter_report(child, f"{indent}    ")
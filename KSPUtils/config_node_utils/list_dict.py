@@ -1,65 +1,283 @@
-from typing import Dict, Generic, Iterator, List, Optional, TypeVar, Union
+from bisect import insort
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 ListDictKey = Union[str, int]
 ValueType = TypeVar("ValueType")
 
+# position of the only value with a key, or positions of all values with it
+IndexEntry = Union[int, List[int]]
+
+# placeholder of a removed value until the storage is compacted
+_REMOVED: Any = object()
+_MISSING: Any = object()
+
 
 class ListDict(Generic[ValueType]):
+    """
+    A list of values that are also indexed by (possibly repeated) keys.
+
+    Removed values are first replaced by placeholders, and the storage
+    is compacted when the placeholders take up half of it, so removing
+    many values does not renumber the index each time.
+    """
+
+    __slots__ = ("_values", "_index", "_shared", "_removed", "_version")
+
     def __init__(self):
         self._values: List[ValueType] = []
-        self._index: Dict[str, List[int]] = {}
+        self._index: Dict[str, IndexEntry] = {}
+        self._shared = False
+        self._removed = 0
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """
+        Incremented by every change of the contents,
+        so that views of them can tell when they are outdated.
+        """
+        return self._version
+
+    @property
+    def shared(self) -> bool:
+        """
+        True if the storage may still be shared with a copy made by `share`
+        """
+        return self._shared
+
+    def share(self) -> "ListDict[ValueType]":
+        """
+        Returns a copy that shares the storage with this ListDict
+        until either of them is changed.
+        """
+        other: ListDict[ValueType] = ListDict()
+        other._values = self._values
+        other._index = self._index
+        other._removed = self._removed
+        other._shared = self._shared = True
+        return other
+
+    def copy(
+        self, copy_value: Optional[Callable[[ValueType], ValueType]] = None
+    ) -> "ListDict[ValueType]":
+        """
+        Returns an independent copy; values are copied with copy_value, if given.
+        """
+        other: ListDict[ValueType] = ListDict()
+        if self._removed:
+            other._values, other._index = self._compacted()
+        else:
+            other._values = list(self._values)
+            other._index = {
+                key: idx if isinstance(idx, int) else list(idx)
+                for key, idx in self._index.items()
+            }
+        if copy_value is not None:
+            other._values = [copy_value(v) for v in other._values]
+        return other
+
+    def _compacted(self) -> Tuple[List[ValueType], Dict[str, IndexEntry]]:
+        """
+        Returns new storage without the removed values
+        """
+        values: List[ValueType] = []
+        positions: List[int] = []
+        for value in self._values:
+            positions.append(len(values))
+            if value is not _REMOVED:
+                values.append(value)
+        index: Dict[str, IndexEntry] = {
+            key: positions[idx] if isinstance(idx, int) else [positions[i] for i in idx]
+            for key, idx in self._index.items()
+        }
+        return values, index
+
+    def _compact(self) -> None:
+        if self._removed:
+            # new storage is built, as the old one may be shared
+            self._values, self._index = self._compacted()
+            self._removed = 0
+
+    def _detach(self) -> None:
+        if self._shared:
+            detached = self.copy()
+            self._values = detached._values
+            self._index = detached._index
+            self._removed = 0
+            self._shared = False
 
     def __bool__(self):
-        return bool(self._values)
+        return len(self._values) > self._removed
 
     def __iter__(self) -> Iterator[ValueType]:
+        if self._removed:
+            return (v for v in self._values if v is not _REMOVED)
         return self._values.__iter__()
 
     def __getitem__(self, key: ListDictKey) -> Optional[ValueType]:
         if isinstance(key, int):
+            self._compact()
             return self._values[key]
         if isinstance(key, str):
-            return self._values[self._index[key][0]]
+            idx = self._index[key]
+            return self._values[idx if isinstance(idx, int) else idx[0]]
         return None
 
     def __setitem__(self, key: ListDictKey, value: ValueType) -> None:
+        self._detach()
+        self._version += 1
         if isinstance(key, int):
+            self._compact()
             self._values[key] = value
         elif isinstance(key, str):
-            idx = self._index.get(key, [])
-            if idx:
-                self._values[idx[0]] = value
-            else:
+            idx = self._index.get(key)
+            if idx is None:
                 self.add(key, value)
+            else:
+                self._values[idx if isinstance(idx, int) else idx[0]] = value
 
     def __contains__(self, key: str) -> bool:
         return key in self._index
 
     def __len__(self) -> int:
-        return len(self._values)
+        return len(self._values) - self._removed
 
     def keys(self) -> List[str]:
         return list(self._index.keys())
 
     def add(self, key: str, value: ValueType) -> None:
+        self._detach()
+        self._version += 1
         idx = len(self._values)
         self._values.append(value)
-        lst = self._index.get(key, None)
-        if lst:
-            lst.append(idx)
+        positions = self._index.get(key)
+        if positions is None:
+            self._index[key] = idx
+        elif isinstance(positions, int):
+            self._index[key] = [positions, idx]
+        else:
+            positions.append(idx)
+
+    def insert(self, pos: int, key: str, value: ValueType) -> None:
+        """
+        Inserts the value before the given position, like list.insert.
+        This renumbers the positions of all the values after it,
+        so to build a ListDict use `add` instead.
+        """
+        self._detach()
+        self._compact()
+        self._version += 1
+        size = len(self._values)
+        if pos < 0:
+            pos = max(size + pos, 0)
+        if pos >= size:
+            self.add(key, value)
+            return
+        self._values.insert(pos, value)
+        index = self._index
+        for k, idx in index.items():
+            if isinstance(idx, int):
+                if idx >= pos:
+                    index[k] = idx + 1
+            elif idx[-1] >= pos:
+                idx[:] = [i + 1 if i >= pos else i for i in idx]
+        positions = index.get(key)
+        if positions is None:
+            index[key] = pos
+        elif isinstance(positions, int):
+            index[key] = [positions, pos] if positions < pos else [pos, positions]
+        else:
+            insort(positions, pos)
+
+    def pop(self, key: str, idx=0, default: Any = _MISSING) -> Union[ValueType, Any]:
+        """
+        Removes the idx-th value with the key and returns it.
+        If there is no such value, returns the default, if given,
+        or raises KeyError.
+        """
+        self._detach()
+        positions = self._index.get(key)
+        if positions is None:
+            pos = None
+        elif isinstance(positions, int):
+            pos = positions if idx in (0, -1) else None
+            if pos is not None:
+                del self._index[key]
+        else:
+            try:
+                pos = positions.pop(idx)
+            except IndexError:
+                pos = None
+            if len(positions) == 1:
+                self._index[key] = positions[0]
+        if pos is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self._version += 1
+        values = self._values
+        value = values[pos]
+        if pos == len(values) - 1:
+            values.pop()
         else:
-            self._index[key] = [idx]
+            values[pos] = _REMOVED
+            self._removed += 1
+            if self._removed > 8 and self._removed * 2 > len(values):
+                self._compact()
+        return value
+
+    def replace(self, key: str, old: ValueType, new: ValueType) -> None:
+        """
+        Puts the new value in place of the old one with the key, found
+        by identity; raises KeyError if there is no such value.
+        """
+        self._detach()
+        positions = self._index.get(key)
+        if positions is not None:
+            for pos in [positions] if isinstance(positions, int) else positions:
+                if self._values[pos] is old:
+                    self._values[pos] = new
+                    self._version += 1
+                    return
+        raise KeyError(key)
+
+    def remove(self, key: str, idx=0) -> None:
+        """
+        Removes the idx-th value with the key; raises KeyError
+        if there is no such value.
+        """
+        self.pop(key, idx)
 
     _GetDefaultType = TypeVar("_GetDefaultType")
 
     def get(
         self, key: str, default: Optional[_GetDefaultType] = None, idx=0
     ) -> Union[ValueType, Optional[_GetDefaultType]]:
+        positions = self._index.get(key)
+        if positions is None:
+            return default
+        if isinstance(positions, int):
+            return self._values[positions] if idx in (0, -1) else default
         try:
-            return self._values[self._index[key][idx]]
-        except (IndexError, KeyError):
+            return self._values[positions[idx]]
+        except IndexError:
             return default
 
     def get_all(self, key: str) -> List[ValueType]:
-        idx = self._index.get(key, [])
-        return [self._values[i] for i in idx]
+        positions = self._index.get(key)
+        if positions is None:
+            return []
+        if isinstance(positions, int):
+            return [self._values[positions]]
+        return [self._values[i] for i in positions]
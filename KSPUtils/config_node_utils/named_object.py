@@ -1,19 +1,38 @@
 import os
+from dataclasses import dataclass, replace
+from io import BytesIO
+from functools import partial
+from multiprocessing import Pool
 from typing import (
+    TYPE_CHECKING,
     Any,
     Callable,
     Dict,
     Generator,
     Generic,
+    Iterable,
+    List,
     Optional,
+    TextIO,
     Tuple,
     Type,
     TypeVar,
     Union,
 )
 
-from KSPUtils.config_node_utils import ConfigNode, ValueCollection
+from KSPUtils.config_node_utils.config_node import ConfigNode, _add_deferred
 from KSPUtils.config_node_utils.list_dict import ListDict
+from KSPUtils.config_node_utils.parse_cache import ParseCache
+from KSPUtils.config_node_utils.tokenizer import DeferredNode, StringTable
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+from KSPUtils.info_extractors.file_extractor import StrPath
+
+if TYPE_CHECKING:
+    from KSPUtils.config_node_utils.part_index import PartIndex
+
+# the subnodes of a ConfigNode, shared with it until either is changed,
+# and its deferred subnodes, see NamedObject._load
+NodeSource = Tuple[ListDict[ConfigNode], Optional[List[DeferredNode]]]
 
 
 class NamedDescriptor:
@@ -28,15 +47,49 @@ _T = TypeVar("_T")
 
 
 class ValueProperty(NamedDescriptor, Generic[_T]):
+    """
+    The converted value with the same name as the property.
+
+    NamedObject instances cache the converted value until the value
+    is changed or another value is added or removed.
+    """
+
     def __init__(self, converter: Callable[[Any], _T]) -> None:
         super().__init__()
         self._convert = converter
 
+    @property
+    def converter(self) -> Callable[[Any], _T]:
+        return self._convert
+
     def __get__(
-        self, instance: ValueCollection, owner: Type[ValueCollection]
+        self, instance: Optional[ValueCollection], owner: Type[ValueCollection]
     ) -> Optional[_T]:
+        if instance is None:
+            return self  # type: ignore[return-value]
+        values = instance.values
+        cache = getattr(instance, "_cache", None)
+        if cache is not None:
+            cached = cache.get(self._name)
+            if cached is not None:
+                cached_values, version, value, raw_value, result = cached
+                if (
+                    cached_values is values
+                    and version == values.version
+                    and (value is None or value.value is raw_value)
+                ):
+                    return result
+        value = values.get(self._name)
+        raw_value = value.value if value is not None else None
+        result = self._convert_value(raw_value)
+        if isinstance(instance, NamedObject):
+            if cache is None:
+                cache = instance._cache = {}
+            cache[self._name] = (values, values.version, value, raw_value, result)
+        return result
+
+    def _convert_value(self, raw_value: Any) -> Optional[_T]:
         try:
-            raw_value = instance.GetValue(self._name)
             return self._convert(raw_value)
         except (AttributeError, ValueError, TypeError):
             return None
@@ -48,102 +101,384 @@ class ValueProperty(NamedDescriptor, Generic[_T]):
 NamedObjectType = TypeVar("NamedObjectType", bound="NamedObject")
 
 
+@dataclass(frozen=True)
+class LoadOptions:
+    """
+    How NamedObject.LoadFromFile and LoadFromPath parse the files
+    and create the objects; the fields are meant to be given by name.
+
+    :param mapped: if True, the files are loaded with ConfigNode.LoadMapped
+    :param cache: if given, the files are loaded with ConfigNode.Load
+        through this cache
+    :param lazy: if True, the files are loaded with ConfigNode.Load
+        in lazy mode, so the children of the objects are only
+        parsed when accessed; has no effect with workers
+    :param view: if True, the objects are created as views
+        of the parsed nodes, see NamedObject.load
+    :param workers: if greater than 1, LoadFromPath parses the files
+        in a pool of that many processes, which send the nodes back
+        in the binary format, see ConfigNode.dump_binary
+    :param ordered: if False, the objects from parallel workers are
+        yielded as soon as any file is parsed instead of in
+        the order of the files
+    :param intern_values: if True, equal short values of all the files
+        share one string, see StringTable
+    """
+
+    mapped: bool = False
+    cache: Optional[ParseCache] = None
+    lazy: bool = False
+    view: bool = False
+    workers: int = 1
+    ordered: bool = True
+    intern_values: bool = False
+
+
+_default_options = LoadOptions()
+
+
 class ChildrenDict(NamedDescriptor, Generic[NamedObjectType]):
+    """
+    A name -> child mapping of the children of the given type.
+
+    The mapping is cached by each instance and is rebuilt only when its
+    children have been added, removed or replaced, or when one of the
+    children in the mapping has been renamed by its methods since.
+    The same dict is returned until then, so it must not be changed.
+    """
+
     def __init__(self, child_type: Type[NamedObjectType]) -> None:
         super().__init__()
         self._type = child_type
 
-    def _iter_children(
-        self, instance: "NamedObject"
-    ) -> Generator[Tuple[str, NamedObjectType], None, None]:
-        for child in instance.children.get_all(self._type.type):
+    def _build(
+        self, children: ListDict["NamedObject"], renames: List[int]
+    ) -> Tuple[Any, ...]:
+        view: Dict[str, NamedObjectType] = {}
+        for child in children.get_all(self._type.type):
             if not isinstance(child, self._type):
                 continue
+            # pylint: disable=protected-access
+            child._owner_renames = renames
             name = child.name
-            if name is None:
-                continue
-            yield name, child
+            if name is not None:
+                view[name] = child
+        return children, children.version, renames[0], view
 
     def __get__(
         self, instance: "NamedObject", owner: Type["NamedObject"]
     ) -> Dict[str, NamedObjectType]:
-        return dict(self._iter_children(instance))
+        children = instance.children
+        # pylint: disable=protected-access
+        renames = instance._renames
+        if renames is None:
+            renames = instance._renames = [0]
+        cache = instance._cache
+        if cache is None:
+            cache = instance._cache = {}
+        cached = cache.get(self._name)
+        if (
+            cached is None
+            or cached[0] is not children
+            or cached[1] != children.version
+            or cached[2] != renames[0]
+        ):
+            cached = cache[self._name] = self._build(children, renames)
+        return cached[3]
+
+
+class TypeName:
+    """
+    The node name of a NamedObject class, which can be overridden
+    by its instances without giving each of them a __dict__.
+    """
+
+    def __get__(
+        self, instance: Optional["NamedObject"], owner: Type["NamedObject"]
+    ) -> str:
+        if instance is None:
+            return owner.default_type
+        return instance._type
+
+    def __set__(self, instance: "NamedObject", value: str) -> None:
+        instance._type = value
 
 
 # noinspection PyPep8Naming
 class NamedObject(ValueCollection):
+    __slots__ = (
+        "_children",
+        "_source",
+        "_view",
+        "_type",
+        "_cache",
+        "_renames",
+        "_owner_renames",
+    )
+
     _db: Dict[str, Type["NamedObject"]] = {}
-    type = "None"
+    default_type = "None"
+    if TYPE_CHECKING:
+        # subclasses declare their type as a plain string, see __init_subclass__
+        type: str
+    else:
+        type = TypeName()
 
     name = ValueProperty(str)
 
     @classmethod
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
+        # subclasses declare their type as a plain string
+        type_name = cls.__dict__.get("type")
+        if isinstance(type_name, str):
+            cls.default_type = type_name
+            delattr(cls, "type")
         cls._db[cls.type] = cls
 
     def __init__(self):
         ValueCollection.__init__(self)
-        self.children: ListDict[NamedObject] = ListDict()
-
-    def __str__(self):
-        node = ConfigNode(self.type)
-        self.save(node)
-        return str(node)
+        self._children: ListDict[NamedObject] = ListDict()
+        # the subnodes the children are created from when they
+        # are accessed for the first time
+        self._source: Optional[NodeSource] = None
+        # whether the children from _source are created as views
+        self._view = False
+        self._type: str = self.default_type
+        # the values computed by the descriptors, see ValueProperty
+        self._cache: Optional[Dict[str, Tuple[Any, ...]]] = None
+        # the number of renames of the children in the ChildrenDict
+        # mappings, shared with those children as _owner_renames
+        self._renames: Optional[List[int]] = None
+        self._owner_renames: Optional[List[int]] = None
+
+    @property
+    def children(self) -> ListDict["NamedObject"]:
+        if self._source is not None:
+            subnodes = self._source_subnodes(self._source)
+            self._source = None
+            self._load_children(subnodes, self._view)
+        return self._children
+
+    @children.setter
+    def children(self, children: ListDict["NamedObject"]) -> None:
+        self._changed()
+        self._children = children
+        self._source = None
+
+    def _node_name(self) -> str:
+        return self.type
+
+    def _own_values(self, name="") -> None:
+        super()._own_values(name)
+        if name == "name":
+            self._renamed()
+
+    def Clone(self, other: "NamedObject") -> None:
+        super().Clone(other)
+        self._renamed()
+
+    def _renamed(self) -> None:
+        if self._owner_renames is not None:
+            self._owner_renames[0] += 1
+
+    def _node_children(self) -> Iterable[ValueCollection]:
+        # the children not created yet are written straight from the nodes
+        if self._source is not None:
+            return self._source_subnodes(self._source)
+        return self._children
+
+    def _source_subnodes(self, source: NodeSource) -> ListDict[ConfigNode]:
+        subnodes, deferred = source
+        if deferred is not None:
+            # the shared subnodes are copied by the first add
+            _add_deferred(subnodes, deferred)
+            self._source = subnodes, None
+        return subnodes
 
     def AddChild(self, obj: "NamedObject") -> None:
+        self._changed()
         self.children.add(obj.type, obj)
 
-    def load(self, node: ConfigNode) -> None:
-        self.values = ListDict()
-        for value in node.values:
-            self.AddValueItem(value)
-        for n in node.subnodes:
+    def load(self, node: ConfigNode, view=False) -> None:
+        """
+        :param node: the node to take the values and the children from
+        :param view: if True, the values are not copied, but shared
+            with the node until either of them is changed (see
+            ValueCollection.Clone), and the children are created, also
+            as views, only when they are accessed for the first time
+        """
+        self._changed()
+        self._renamed()
+        self._load(node, view)
+
+    def _load(self, node: ConfigNode, view: bool) -> None:
+        # the object may replace the node in a collection with a cached hash
+        # pylint: disable=protected-access
+        self._hash = node._hash
+        if view:
+            self.values = node.values.share()
+        else:
+            values = self.values = ListDict()
+            for value in node.values:
+                values.add(value.name, value)
+        if self._source is not None or self._children or (node.parsed and not view):
+            self._load_children(node.subnodes, view)
+        else:
+            # the children of a lazily parsed node are created when they
+            # are accessed for the first time, from a snapshot of its
+            # subnodes, so that later changes of the node do not show up
+            # pylint: disable=protected-access
+            self._source = node._subnodes.share(), node._deferred
+            self._view = view
+
+    def _load_children(self, subnodes: Iterable[ConfigNode], view: bool) -> None:
+        children = self.children
+        for n in subnodes:
             c = self._create(n.name)
-            self.children.add(c.type, c)
-            c.load(n)
+            children.add(c.type, c)
+            c._load(n, view)
 
     def save(self, node):
-        for value in node.values:
-            self.AddValueItem(value)
+        for value in self.values:
+            node.AddValueItem(value)
         for c in self.children:
             c.save(node.AddNode(c.type))
 
     @classmethod
     def LoadFromFile(
-        cls: Type[NamedObjectType], path: str
+        cls: Type[NamedObjectType],
+        path: str,
+        options: LoadOptions = _default_options,
+        strings: Optional[StringTable] = None,
     ) -> Generator["NamedObject", None, None]:
-        for obj in cls.LoadFromNode(ConfigNode.Load(path)):
-            yield obj
+        """
+        :param path: path to a .cfg file
+        :param options: how the file is parsed, see LoadOptions
+        :param strings: if given, the values are shared through it,
+            see ConfigNode.Parse; not used with mapped. If not given
+            and options.intern_values is set, a new table is used.
+        """
+        if strings is None and options.intern_values:
+            strings = StringTable()
+        for node in cls._file_nodes(path, options, strings):
+            yield cls.from_node(node, options.view)
+
+    @classmethod
+    def _file_nodes(
+        cls, path: str, options: LoadOptions, strings: Optional[StringTable]
+    ) -> Generator[ConfigNode, None, None]:
+        """
+        Yields the nodes of the objects of this type from the file,
+        see LoadFromFile.
+        """
+        if options.mapped:
+            node = ConfigNode.LoadMapped(path)
+        elif options.cache is not None or options.lazy:
+            node = ConfigNode.Load(path, options.cache, options.lazy, strings)
+        else:
+            try:
+                for event, subnode in ConfigNode.iterparse(path, (cls.type,), strings):
+                    if event == "node":
+                        yield subnode
+            except Exception as exc:
+                print(f"Unable to parse {path}: {exc!s}")
+            return
+        yield from cls._find_nodes(node)
+
+    @classmethod
+    def LoadFromStream(
+        cls: Type[NamedObjectType],
+        source: Union[StrPath, TextIO],
+        strings: Optional[StringTable] = None,
+        view=False,
+    ) -> Generator["NamedObject", None, None]:
+        """
+        Yields objects of this type as soon as they are read from the file
+        or text stream, without building the tree of the whole input.
+        """
+        for event, node in ConfigNode.iterparse(source, (cls.type,), strings):
+            if event == "node":
+                yield cls.from_node(node, view)
 
     @classmethod
     def LoadFromPath(
-        cls: Type[NamedObjectType], path: str, ext=".cfg", followlinks=True
+        cls: Type[NamedObjectType],
+        path: str,
+        ext=".cfg",
+        followlinks=True,
+        options: LoadOptions = _default_options,
+        index: Optional["PartIndex"] = None,
     ) -> Generator[Optional["NamedObject"], None, None]:
+        """
+        Yields objects of this type from the file or from all the files
+        with the given extension found in the directory tree.
+
+        :param options: how the files are parsed, see LoadOptions
+        :param index: if given, every object is added to it as it is yielded
+        """
+        strings = StringTable() if options.intern_values else None
         if os.path.isfile(path):
-            for obj in cls.LoadFromFile(path):
-                yield obj
+            yield from _indexed(cls.LoadFromFile(path, options, strings), index, path)
             return
         if not os.path.isdir(path):
             yield None
             return
-        for dirpath, _dirnames, filenames in os.walk(path, followlinks=followlinks):
-            for filename in filenames:
-                if not filename.endswith(ext):
-                    continue
-                for obj in cls.LoadFromFile(os.path.join(dirpath, filename)):
-                    yield obj
+        filepaths = (
+            os.path.join(dirpath, filename)
+            for dirpath, _dirnames, filenames in os.walk(path, followlinks=followlinks)
+            for filename in filenames
+            if filename.endswith(ext)
+        )
+        if options.workers > 1:
+            yield from cls._load_in_workers(filepaths, options, strings, index)
+            return
+        for filepath in filepaths:
+            yield from _indexed(
+                cls.LoadFromFile(filepath, options, strings), index, filepath
+            )
+
+    @classmethod
+    def _load_in_workers(
+        cls,
+        filepaths: Iterable[str],
+        options: LoadOptions,
+        strings: Optional[StringTable],
+        index: Optional["PartIndex"],
+    ) -> Generator["NamedObject", None, None]:
+        """
+        Parses the files in a pool of worker processes, see LoadOptions.workers
+        """
+        dump: Callable[[str], Tuple[str, bytes]] = partial(
+            _dump_file_nodes, cls, options
+        )
+        with Pool(options.workers) as pool:
+            results: Iterable[Tuple[str, bytes]]
+            if options.ordered:
+                results = pool.imap(dump, filepaths, chunksize=8)
+            else:
+                results = pool.imap_unordered(dump, filepaths, chunksize=8)
+            for filepath, data in results:
+                root = ConfigNode.load_binary(BytesIO(data), strings)
+                # nothing else refers to the loaded nodes, so the objects
+                # are created as their views, which is much faster
+                objects = (cls.from_node(n, True) for n in root.subnodes)
+                yield from _indexed(objects, index, filepath)
 
     @classmethod
     def LoadFromNode(
-        cls: Type[NamedObjectType], node: ConfigNode
+        cls: Type[NamedObjectType], node: ConfigNode, view=False
     ) -> Generator["NamedObject", None, None]:
+        for subnode in cls._find_nodes(node):
+            yield cls.from_node(subnode, view)
+
+    @classmethod
+    def _find_nodes(cls, node: ConfigNode) -> Generator[ConfigNode, None, None]:
         if node.name == cls.type:
-            yield cls.from_node(node)
+            yield node
         elif node.subnodes:
             for subnode in node.subnodes:
-                for obj in cls.LoadFromNode(subnode):
-                    yield obj
+                yield from cls._find_nodes(subnode)
 
     @classmethod
     def Patch(
@@ -168,12 +503,55 @@ class NamedObject(ValueCollection):
     ) -> Union[NamedObjectType, "NamedObject"]:
         klass = cls._db.get(typename, NamedObject)
         o = klass()
-        o.type = typename
+        # pylint: disable=protected-access
+        o._type = typename
         return o
 
     @classmethod
-    def from_node(cls: Type[NamedObjectType], node: ConfigNode) -> NamedObjectType:
+    def from_node(
+        cls: Type[NamedObjectType], node: ConfigNode, view=False
+    ) -> NamedObjectType:
+        """
+        :param view: if True, the object shares the values and the
+            subnodes of the node instead of copying them, see load
+        """
         obj: NamedObjectType = cls()
         obj.type = node.name
-        obj.load(node)
+        obj._load(node, view)
         return obj
+
+
+def prefetch(objects: Iterable[ValueCollection], *properties: str) -> List[tuple]:
+    """
+    Converts the values of the named ValueProperty-s of all the objects
+    in one pass, so that they are cached for later access.
+
+    :return: the tuples of the property values of every object
+    """
+    return [tuple(getattr(obj, p) for p in properties) for obj in objects]
+
+
+def _dump_file_nodes(
+    cls: Type[NamedObject], options: LoadOptions, filepath: str
+) -> Tuple[str, bytes]:
+    """
+    Parses the file in a worker process and returns the nodes
+    of its objects in the binary format, which the parent process
+    loads much faster than it would unpickle the objects.
+    """
+    # pylint: disable=protected-access
+    root = ConfigNode()
+    for node in cls._file_nodes(filepath, replace(options, lazy=False), None):
+        root.AddNode(node)
+    out = BytesIO()
+    root.dump_binary(out)
+    return filepath, out.getvalue()
+
+
+def _indexed(
+    objects: Iterable[NamedObjectType], index: Optional["PartIndex"], source: str
+) -> Generator[NamedObjectType, None, None]:
+    for obj in objects:
+        if index is not None:
+            index.add(obj, source)
+        yield obj
@@ -6,16 +6,19 @@ from KSPUtils.config_node_utils.named_object import (
 
 
 class Resource(NamedObject):
+    __slots__ = ()
     type = "RESOURCE"
     amount = ValueProperty(float)
     maxAmount = ValueProperty(float)
 
 
 class Module(NamedObject):
+    __slots__ = ()
     type = "MODULE"
 
 
 class Part(NamedObject):
+    __slots__ = ()
     type = "PART"
     mass = ValueProperty(float)
     cost = ValueProperty(float)
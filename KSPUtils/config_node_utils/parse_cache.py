@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, TypeVar
+
+from KSPUtils.config_node_utils.config_node import ConfigNode
+from KSPUtils.info_extractors.file_extractor import StrPath
+
+_T = TypeVar("_T")
+
+
+def _dump_node(node: Any, stream: BinaryIO) -> None:
+    node.dump_binary(stream)
+
+
+def _load_node(stream: BinaryIO) -> Any:
+    return ConfigNode.load_binary(stream)
+
+
+def _entry_header(path: str, stat: os.stat_result) -> bytes:
+    """
+    The key of the entry of the file, written before the result.
+    It ends with the only zero byte, which no path contains, so that
+    a header of another key is never read as a prefix of this one.
+    """
+    return b"%d %d %s\0" % (stat.st_size, stat.st_mtime_ns, os.fsencode(path))
+
+
+class ParseCache:
+    """
+    Persistent on-disk cache of parsed files.
+
+    Each entry is keyed by the absolute path of the source file, its size
+    and modification time, so an entry is only used while the file stays
+    unchanged. Unusable entries are silently ignored and replaced.
+
+    The directory is not scanned on every store: only when the entries
+    written by this instance since the last scan exceed an eighth
+    of max_size, the least recently used entries are removed until
+    the total size is within max_size. In between, the total size may
+    exceed max_size by that much.
+    """
+
+    suffix = ".node"
+
+    def __init__(self, directory: StrPath, max_size=512 * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        # the size of the entries written since the directory was scanned
+        self._written = 0
+
+    def load(
+        self,
+        filename: StrPath,
+        parse: Callable[[str], _T],
+        dump: Callable[[_T, BinaryIO], None] = _dump_node,
+        load: Callable[[BinaryIO], _T] = _load_node,
+    ) -> _T:
+        """
+        Returns the cached result of parse(filename) if the file has not
+        changed since it was cached; otherwise parses the file and caches
+        the result. Exceptions raised by parse are propagated, nothing
+        is cached in that case.
+
+        :param dump: writes the result to the cache entry; by default
+            the result is a ConfigNode written in the binary format,
+            see ConfigNode.dump_binary
+        :param load: reads the result written by dump. Anyone who can
+            write to the directory controls what it reads, so a codec
+            that can run code, such as pickle, should only be used
+            with a directory nobody else can write to.
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        header = _entry_header(path, stat)
+        entry = self.directory / (
+            hashlib.sha1(path.encode("utf8")).hexdigest() + self.suffix
+        )
+        try:
+            with entry.open("rb") as inp:
+                if inp.read(len(header)) == header:
+                    result = load(inp)
+                    os.utime(entry)
+                    return result
+        except Exception:
+            pass
+        result = parse(path)
+        self._store(entry, header, result, dump)
+        return result
+
+    def _store(
+        self,
+        entry: Path,
+        header: bytes,
+        result: _T,
+        dump: Callable[[_T, BinaryIO], None],
+    ) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(header)
+                dump(result, out)
+                size = out.tell()
+            os.replace(tmp, entry)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._written += size
+        if self._written > self.max_size // 8:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+        entries.sort()
+        total = sum(size for _mtime, size, _entry in entries)
+        for _mtime, size, entry in entries:
+            if total <= self.max_size:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._written = 0
+
+    def clear(self) -> None:
+        for entry in self.directory.glob(f"*{self.suffix}"):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+        self._written = 0
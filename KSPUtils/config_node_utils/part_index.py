@@ -0,0 +1,212 @@
+from bisect import bisect_left
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from KSPUtils.config_node_utils.named_object import NamedObject
+from KSPUtils.config_node_utils.objects import Module, Resource
+from KSPUtils.config_node_utils.tokenizer import DeferredNode
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+# a child of a part, or the node or the deferred node it is created from
+_Child = Union[ValueCollection, DeferredNode]
+# a key -> rows index
+_Index = Dict[str, List[int]]
+
+
+def _add_row(index: _Index, key: Optional[str], row: int) -> None:
+    if key is None:
+        return
+    rows = index.get(key)
+    if rows is None:
+        index[key] = [row]
+    elif rows[-1] != row:
+        rows.append(row)
+
+
+def _insert_row(index: _Index, key: Optional[str], row: int) -> None:
+    """Same as _add_row, but the row may be before the last one"""
+    if key is None:
+        return
+    rows = index.get(key)
+    if rows is None:
+        index[key] = [row]
+        return
+    i = bisect_left(rows, row)
+    if i == len(rows) or rows[i] != row:
+        rows.insert(i, row)
+
+
+def _remove_row(index: _Index, row: int) -> None:
+    for key in list(index):
+        rows = index[key]
+        i = bisect_left(rows, row)
+        if i < len(rows) and rows[i] == row:
+            del rows[i]
+            if not rows:
+                del index[key]
+
+
+def _children(part: NamedObject) -> Iterator[Tuple[str, _Child]]:
+    """
+    Yields the types of the children of the part with the children,
+    or with the nodes they are not created from yet, so that the index
+    does not create them.
+    """
+    # pylint: disable=protected-access
+    source = part._source
+    if source is None:
+        for child in part.children:
+            yield child.type, child
+        return
+    subnodes, deferred = source
+    for subnode in subnodes:
+        yield subnode.name, subnode
+    for d in deferred or ():
+        yield d.name, d
+
+
+def _child_name(child: _Child) -> Optional[str]:
+    if isinstance(child, DeferredNode):
+        return child.name_value
+    return child.GetValue("name")
+
+
+class PartIndex:
+    """
+    Secondary indexes over loaded parts (or any other NamedObject-s):
+    by name, by the names of their modules and resources, by the keys
+    of their values and by the types of their children.
+
+    Parts are added one by one, in the order they are loaded;
+    the lookups return the parts in the same order. The index is not
+    notified of the changes of the parts: a part that has been changed,
+    e.g. renamed, after it was added should be given to `update`.
+    """
+
+    def __init__(self) -> None:
+        self.parts: List[NamedObject] = []
+        self._sources: List[Optional[str]] = []
+        self._rows: Dict[NamedObject, int] = {}
+        self._names: _Index = {}
+        self._modules: _Index = {}
+        self._resources: _Index = {}
+        self._keys: _Index = {}
+        self._children: _Index = {}
+        self._by_kind = {
+            "name": self._names,
+            "key": self._keys,
+            "child": self._children,
+            "module": self._modules,
+            "resource": self._resources,
+        }
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def __iter__(self) -> Iterator[NamedObject]:
+        return iter(self.parts)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def add(self, part: NamedObject, source: Optional[str] = None) -> None:
+        """
+        :param part: the part to add to the index
+        :param source: the file the part was loaded from
+        """
+        row = len(self.parts)
+        self.parts.append(part)
+        self._rows[part] = row
+        self._sources.append(source)
+        self._index(part, row, _add_row)
+
+    def update(self, part: NamedObject) -> None:
+        """
+        Indexes the part again, after it has been changed. It keeps its
+        row and its source. This goes through the whole index, so it is
+        meant for the occasional changes, not for building the index.
+
+        :raises KeyError: if the part has not been added
+        """
+        row = self._rows[part]
+        for index in self._by_kind.values():
+            _remove_row(index, row)
+        self._index(part, row, _insert_row)
+
+    def _index(
+        self,
+        part: NamedObject,
+        row: int,
+        add_row: Callable[[_Index, Optional[str], int], None],
+    ) -> None:
+        add_row(self._names, part.GetValue("name"), row)
+        for value in part.values:
+            add_row(self._keys, value.name, row)
+        for child_type, child in _children(part):
+            add_row(self._children, child_type, row)
+            if child_type == Module.type:
+                add_row(self._modules, _child_name(child), row)
+            elif child_type == Resource.type:
+                add_row(self._resources, _child_name(child), row)
+
+    def _parts(self, rows: Optional[List[int]]) -> List[NamedObject]:
+        if rows is None:
+            return []
+        return [self.parts[row] for row in rows]
+
+    def get(self, name: str) -> Optional[NamedObject]:
+        """The first part with the name"""
+        rows = self._names.get(name)
+        return self.parts[rows[0]] if rows else None
+
+    def named(self, name: str) -> List[NamedObject]:
+        """All the parts with the name, e.g. a part and its copies in other mods"""
+        return self._parts(self._names.get(name))
+
+    def with_module(self, name: str) -> List[NamedObject]:
+        return self._parts(self._modules.get(name))
+
+    def with_resource(self, name: str) -> List[NamedObject]:
+        return self._parts(self._resources.get(name))
+
+    def with_value(self, key: str) -> List[NamedObject]:
+        return self._parts(self._keys.get(key))
+
+    def with_child(self, child_type: str) -> List[NamedObject]:
+        return self._parts(self._children.get(child_type))
+
+    def matching_rows(self, kind: str, match: Callable[[str], bool]) -> Set[int]:
+        """
+        The rows, that is the numbers in the load order, of the parts
+        that have a name, a value key, a child type, a module name
+        or a resource name accepted by match.
+
+        :param kind: "name", "key", "child", "module" or "resource"
+        """
+        rows: Set[int] = set()
+        for key, key_rows in self._by_kind[kind].items():
+            if match(key):
+                rows.update(key_rows)
+        return rows
+
+    def at_rows(self, rows: Iterable[int]) -> List[NamedObject]:
+        """The parts at the rows, in the load order"""
+        return [self.parts[row] for row in sorted(rows)]
+
+    def source(self, part: NamedObject) -> Optional[str]:
+        """The file the part was loaded from, if it was given to `add`"""
+        row = self._rows.get(part)
+        return self._sources[row] if row is not None else None
+
+    def sources(self, name: str) -> List[Optional[str]]:
+        """The files where the parts with the name are defined"""
+        return [self._sources[row] for row in self._names.get(name, ())]
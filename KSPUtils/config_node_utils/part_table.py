@@ -0,0 +1,210 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from KSPUtils.config_node_utils.named_object import LoadOptions, ValueProperty
+from KSPUtils.config_node_utils.objects import Module, Part, Resource
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+_FLOAT_CONVERTERS = (float, int)
+
+
+class _Codes:
+    """Assigns consecutive integer codes to strings"""
+
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.codes)
+
+
+class PartTable:
+    """
+    Columnar NumPy representation of a set of parts.
+
+    Numeric fields (ValueProperty-s with float or int converter)
+    become float columns with NaN for missing values; other fields
+    become int32 columns of codes into the list of their categories,
+    with -1 for missing values. For each of the given resources there are
+    "<resource>.amount" and "<resource>.maxAmount" float columns,
+    with zeros for the parts that do not have the resource.
+    The named modules of every part are stored as the codes of their names:
+    the codes of the modules of the row i are
+    module_codes[module_offsets[i]:module_offsets[i + 1]].
+
+    For example, the total cost per ton of every category:
+
+        table = PartTable.from_parts(parts, ("category", "mass", "cost"))
+        codes = table["category"]
+        known = codes >= 0
+        cost = np.bincount(codes[known], table["cost"][known])
+        mass = np.bincount(codes[known], table["mass"][known])
+        dict(zip(table.categories("category"), cost / mass))
+    """
+
+    def __init__(self) -> None:
+        self.parts: List[Part] = []
+        self.columns: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, List[str]] = {}
+        self.module_names: List[str] = []
+        self.module_codes = np.zeros(0, dtype=np.int32)
+        self.module_offsets = np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def from_parts(
+        cls,
+        parts: Iterable[Part],
+        fields: Sequence[str] = ("name", "mass", "cost"),
+        resources: Sequence[str] = (),
+    ) -> "PartTable":
+        """
+        :param parts: the parts, one per row
+        :param fields: names of the part values or properties to make columns of
+        :param resources: names of the resources to make amount columns of
+        """
+        builder = _TableBuilder(fields, resources)
+        for part in parts:
+            builder.add(part)
+        return builder.build(cls())
+
+    @classmethod
+    def from_path(
+        cls,
+        path: str,
+        fields: Sequence[str] = ("name", "mass", "cost"),
+        resources: Sequence[str] = (),
+        options: LoadOptions = LoadOptions(),
+    ) -> "PartTable":
+        """
+        Loads the parts from the file or the directory tree
+        with Part.LoadFromPath and makes a table of them.
+
+        :param options: how the files are parsed, see LoadOptions
+        """
+        parts = Part.LoadFromPath(path, options=options)
+        return cls.from_parts(
+            (p for p in parts if isinstance(p, Part)), fields, resources
+        )
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def categories(self, column: str) -> List[str]:
+        """The strings coded by the values of the categorical column"""
+        return self._categories[column]
+
+    def equals(self, column: str, value: str) -> np.ndarray:
+        """The mask of the rows where the categorical column has the value"""
+        try:
+            code = self._categories[column].index(value)
+        except ValueError:
+            return np.zeros(len(self.parts), dtype=bool)
+        return self.columns[column] == code
+
+    def has_module(self, name: str) -> np.ndarray:
+        """The mask of the rows of the parts having a module with the name"""
+        mask = np.zeros(len(self.parts), dtype=bool)
+        try:
+            code = self.module_names.index(name)
+        except ValueError:
+            return mask
+        rows = np.repeat(np.arange(len(self.parts)), np.diff(self.module_offsets))
+        mask[rows[self.module_codes == code]] = True
+        return mask
+
+    def select(self, mask: np.ndarray) -> List[Part]:
+        """The parts of the rows selected by the mask"""
+        return [self.parts[row] for row in np.flatnonzero(mask)]
+
+
+class _TableBuilder:
+    """Collects the columns of a PartTable row by row"""
+
+    def __init__(self, fields: Sequence[str], resources: Sequence[str]) -> None:
+        self.fields = fields
+        self.resources = resources
+        self.parts: List[Part] = []
+        self.numeric = [_is_numeric(field) for field in fields]
+        self.values: List[list] = [[] for _field in fields]
+        self.codes = [_Codes() for _field in fields]
+        self.amounts: Dict[str, List[float]] = {
+            f"{resource}.{column}": []
+            for resource in resources
+            for column in ("amount", "maxAmount")
+        }
+        self.module_names = _Codes()
+        self.module_codes: List[int] = []
+        self.module_offsets = [0]
+
+    def add(self, part: Part) -> None:
+        self.parts.append(part)
+        for field, is_numeric, column, field_codes in zip(
+            self.fields, self.numeric, self.values, self.codes
+        ):
+            if is_numeric:
+                value = getattr(part, field)
+                column.append(np.nan if value is None else value)
+            else:
+                column.append(field_codes.code(_get_str(part, field)))
+        if self.resources:
+            part_resources = part.resources
+            for resource in self.resources:
+                res = part_resources.get(resource)
+                _append_amount(self.amounts[f"{resource}.amount"], res, "amount")
+                _append_amount(self.amounts[f"{resource}.maxAmount"], res, "maxAmount")
+        for module in part.children.get_all(Module.type):
+            module_name = _get_str(module, "name")
+            if module_name is not None:
+                self.module_codes.append(self.module_names.code(module_name))
+        self.module_offsets.append(len(self.module_codes))
+
+    def build(self, table: PartTable) -> PartTable:
+        table.parts = self.parts
+        for field, is_numeric, column, field_codes in zip(
+            self.fields, self.numeric, self.values, self.codes
+        ):
+            if is_numeric:
+                table.columns[field] = np.array(column, dtype=np.float64)
+            else:
+                table.columns[field] = np.array(column, dtype=np.int32)
+                # pylint: disable=protected-access
+                table._categories[field] = field_codes.categories
+        for name, amount in self.amounts.items():
+            table.columns[name] = np.array(amount, dtype=np.float64)
+        table.module_names = self.module_names.categories
+        table.module_codes = np.array(self.module_codes, dtype=np.int32)
+        table.module_offsets = np.array(self.module_offsets, dtype=np.int64)
+        return table
+
+
+def _is_numeric(field: str) -> bool:
+    prop = getattr(Part, field, None)
+    return isinstance(prop, ValueProperty) and prop.converter in _FLOAT_CONVERTERS
+
+
+def _get_str(obj: ValueCollection, field: str) -> Optional[str]:
+    value = obj.GetValue(field)
+    return None if value is None else str(value)
+
+
+def _append_amount(
+    column: List[float], resource: Optional[Resource], name: str
+) -> None:
+    if resource is None:
+        column.append(0.0)
+    else:
+        value = getattr(resource, name)
+        column.append(np.nan if value is None else value)
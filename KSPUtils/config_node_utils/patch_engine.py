@@ -0,0 +1,752 @@
+import math
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    Union,
+)
+
+from KSPUtils.config_node_utils.config_node import ConfigNode
+from KSPUtils.config_node_utils.named_object import NamedObject
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+NODE_OPERATORS = frozenset("@+$!-%&")
+VALUE_OPERATORS = frozenset("@!-%&")
+ARITHMETIC_OPERATORS = frozenset("*/+-!^")
+# ModuleManager passes: the stage and the order within the mod passes;
+# the patches without a pass specifier go right after :FIRST
+_PASSES = {
+    "FIRST": (0, 0),
+    "BEFORE": (2, 0),
+    "FOR": (2, 1),
+    "AFTER": (2, 2),
+    "LAST": (3, 0),
+    "FINAL": (4, 0),
+}
+_LEGACY_PASS = (1, 0)
+# the passes that are named by a mod
+_MOD_PASSES = frozenset(("BEFORE", "FOR", "AFTER", "LAST"))
+
+# an index of a node or value: a number or all of them
+Index = Union[int, str]
+ALL = "*"
+
+
+class PatchError(ValueError):
+    """The patch cannot be parsed"""
+
+
+@lru_cache(maxsize=4096)
+def _compile_wildcard(pattern: str) -> Pattern:
+    alternatives = []
+    for alternative in pattern.split("|"):
+        regex = "".join(
+            ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in alternative
+        )
+        alternatives.append(regex)
+    return re.compile(f"(?:{'|'.join(alternatives)})\\Z", re.DOTALL)
+
+
+def _is_wildcard(pattern: str) -> bool:
+    return any(c in pattern for c in "*?|")
+
+
+Matcher = Callable[[Optional[str]], bool]
+
+
+def _any_name(value: Optional[str]) -> bool:
+    return value is not None
+
+
+@lru_cache(maxsize=4096)
+def _matcher(pattern: str) -> Matcher:
+    """A function matching a string to the name pattern"""
+    if pattern == "*":
+        return _any_name
+    if not _is_wildcard(pattern):
+        # not pattern.__eq__, which returns the truthy NotImplemented for None
+        return lambda value: value == pattern
+    match = _compile_wildcard(pattern).match
+    return lambda value: value is not None and match(value) is not None
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _closing_bracket(text: str, start: int) -> int:
+    """The position of the "]" closing the "[" at text[start]"""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "[":
+            depth += 1
+        elif text[i] == "]":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise PatchError(f"Unbalanced brackets: {text}")
+
+
+class Condition:
+    """
+    A single :HAS condition:
+    @NODE[name]:HAS[...] and !NODE[name] require a subnode to exist or not;
+    #key[value] and ~key[value] require a value to exist or not.
+    A value pattern may also be <number or >number.
+    """
+
+    __slots__ = ("operator", "selector", "key", "value", "_value_matches")
+
+    def __init__(self, text: str) -> None:
+        text = text.strip()
+        if not text or text[0] not in ("@", "!", "#", "~"):
+            raise PatchError(f"Invalid :HAS condition: {text}")
+        self.operator = text[0]
+        self.selector: Optional[Selector] = None
+        self.key = ""
+        self.value: Optional[str] = None
+        self._value_matches: Optional[Matcher] = None
+        if self.operator in ("@", "!"):
+            self.selector = Selector(text[1:])
+            return
+        bracket = text.find("[")
+        if bracket < 0:
+            self.key = text[1:].strip()
+        else:
+            self.key = text[1:bracket].strip()
+            # an empty pattern matches any value
+            self.value = text[bracket + 1 : _closing_bracket(text, bracket)] or None
+        if self.value is not None:
+            self._value_matches = _value_matcher(self.value)
+
+    def check(self, obj: NamedObject) -> bool:
+        found = False
+        if self.selector is not None:
+            for child in obj.children.get_all(self.selector.type):
+                if self.selector.matches(child):
+                    found = True
+                    break
+            return found if self.operator == "@" else not found
+        values = obj.values.get_all(self.key)
+        if self._value_matches is None:
+            found = bool(values)
+        else:
+            for value in values:
+                if self._value_matches(value.value):
+                    found = True
+                    break
+        return found if self.operator == "#" else not found
+
+
+def _value_matcher(pattern: str) -> Matcher:
+    if not pattern or pattern[0] not in ("<", ">"):
+        name_matches = _matcher(pattern)
+        return lambda value: name_matches(str(value))
+    try:
+        limit = float(pattern[1:])
+    except ValueError as exc:
+        raise PatchError(f"Invalid number in :HAS condition: {pattern}") from exc
+    less = pattern[0] == "<"
+
+    def compare(value: Optional[str]) -> bool:
+        try:
+            number = float(value)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return False
+        return number < limit if less else number > limit
+
+    return compare
+
+
+def _parse_needs(text: Optional[str], selector: str) -> List[Tuple[str, ...]]:
+    """
+    Parses the content of :NEEDS[...]: the mods separated by "," or "&"
+    are all required, and of those separated by "|" any one is;
+    a mod after "!" must be absent.
+    """
+    clauses = []
+    for clause in re.split("[,&]", text or ""):
+        mods = tuple(mod.strip().lower() for mod in clause.split("|"))
+        if not all(mod.lstrip("!").strip() for mod in mods):
+            raise PatchError(f"Invalid :NEEDS in: {selector}")
+        clauses.append(tuple(mod[0] + mod[1:].strip() for mod in mods))
+    return clauses
+
+
+def _needs_met(clauses: List[Tuple[str, ...]], mods: Set[str]) -> bool:
+    for clause in clauses:
+        for mod in clause:
+            if (mod[1:] not in mods) if mod[0] == "!" else (mod in mods):
+                break
+        else:
+            return False
+    return True
+
+
+class Selector:
+    """
+    Parsed ModuleManager node selector:
+    [operator]TYPE[name pattern][,index][:HAS[conditions]][:pass][:NEEDS[mods]]
+    """
+
+    __slots__ = (
+        "operator",
+        "type",
+        "name",
+        "index",
+        "conditions",
+        "pass_name",
+        "pass_mod",
+        "needs",
+        "_name_matches",
+    )
+
+    def __init__(self, text: str) -> None:
+        text = text.strip()
+        if not text:
+            raise PatchError("Empty node selector")
+        self.operator = ""
+        if text[0] in NODE_OPERATORS:
+            self.operator = text[0]
+            text = text[1:].lstrip()
+        end = len(text)
+        for stop in "[:,":
+            pos = text.find(stop)
+            if 0 <= pos < end:
+                end = pos
+        self.type = text[:end].strip()
+        if not self.type:
+            raise PatchError(f"No node type in: {text}")
+        self.name: Optional[str] = None
+        self.index: Optional[Index] = None
+        self.conditions: List[Condition] = []
+        # the pass specifier, e.g. FOR, and the mod it names
+        self.pass_name: Optional[str] = None
+        self.pass_mod: Optional[str] = None
+        # the clauses of :NEEDS, see _parse_needs
+        self.needs: List[Tuple[str, ...]] = []
+        pos = end
+        self._name_matches: Optional[Matcher] = None
+        if pos < len(text) and text[pos] == "[":
+            close = _closing_bracket(text, pos)
+            self.name = text[pos + 1 : close]
+            self._name_matches = _matcher(self.name)
+            pos = close + 1
+        while pos < len(text):
+            if text[pos] == ",":
+                end = text.find(":", pos)
+                if end < 0:
+                    end = len(text)
+                self.index = _parse_index(text[pos + 1 : end])
+                pos = end
+            elif text[pos] == ":":
+                bracket = text.find("[", pos)
+                next_colon = text.find(":", pos + 1)
+                if bracket < 0 or 0 <= next_colon < bracket:
+                    end = next_colon if next_colon >= 0 else len(text)
+                    word, content = text[pos + 1 : end], None
+                    pos = end
+                else:
+                    close = _closing_bracket(text, bracket)
+                    word, content = text[pos + 1 : bracket], text[bracket + 1 : close]
+                    pos = close + 1
+                word = word.strip().upper()
+                if word == "HAS":
+                    if content:
+                        self.conditions.extend(
+                            Condition(c) for c in _split_top_level(content, ",")
+                        )
+                elif word == "NEEDS":
+                    self.needs.extend(_parse_needs(content, text))
+                elif word in _PASSES:
+                    self._set_pass(word, content, text)
+                else:
+                    raise PatchError(f"Unknown specifier :{word} in: {text}")
+            elif text[pos].isspace():
+                pos += 1
+            else:
+                raise PatchError(f"Unexpected text in: {text}")
+
+    def _set_pass(self, word: str, content: Optional[str], text: str) -> None:
+        if self.pass_name is not None:
+            raise PatchError(f"More than one pass specifier in: {text}")
+        mod = (content or "").strip()
+        if (word in _MOD_PASSES) != bool(mod):
+            raise PatchError(f"Invalid :{word} in: {text}")
+        self.pass_name = word
+        self.pass_mod = mod.lower() or None
+
+    def pass_key(self) -> Tuple[int, str, int]:
+        """The key that sorts the patches in the order of their passes"""
+        if self.pass_name is None:
+            stage, order = _LEGACY_PASS
+        else:
+            stage, order = _PASSES[self.pass_name]
+        return stage, self.pass_mod or "", order
+
+    def matches(self, obj: NamedObject) -> bool:
+        """Checks the type, the name and the :HAS conditions"""
+        return (
+            obj.type == self.type
+            and (self._name_matches is None or self._name_matches(obj.GetValue("name")))
+            and self.check(obj)
+        )
+
+    def check(self, obj: NamedObject) -> bool:
+        """Checks only the :HAS conditions"""
+        for condition in self.conditions:
+            if not condition.check(obj):
+                return False
+        return True
+
+    def select(self, objects: List[NamedObject], default: Index) -> List[NamedObject]:
+        """
+        Selects the matching objects by the index of the selector,
+        or by the default one if the selector has none.
+        """
+        matching = [obj for obj in objects if self.matches(obj)]
+        return _select_by_index(
+            matching, self.index if self.index is not None else default
+        )
+
+
+def _parse_index(text: str) -> Index:
+    text = text.strip()
+    if text == ALL:
+        return ALL
+    try:
+        return int(text)
+    except ValueError as exc:
+        raise PatchError(f"Invalid index: {text}") from exc
+
+
+def _select_by_index(items: List, index: Index) -> List:
+    if index == ALL:
+        return items
+    try:
+        return [items[index]]  # type: ignore[index]
+    except IndexError:
+        return []
+
+
+def _format_number(number: float) -> str:
+    # the 15 significant digits KSP itself writes numbers with
+    return format(number, ".15g")
+
+
+def _calculate(operator: str, old: str, operand: str) -> Optional[str]:
+    if operator == "^":
+        if len(operand) < 2:
+            return None
+        # :pattern:replacement: with any separator instead of ":"
+        separator = operand[0]
+        parts = operand[1:].split(separator)
+        if len(parts) < 2:
+            return None
+        try:
+            return re.sub(parts[0], parts[1], old)
+        except re.error:
+            return None
+    try:
+        a = float(old)
+        b = float(operand)
+        if operator == "*":
+            result = a * b
+        elif operator == "/":
+            result = a / b
+        elif operator == "+":
+            result = a + b
+        elif operator == "-":
+            result = a - b
+        else:
+            result = math.pow(a, b)
+    except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+        return None
+    return _format_number(result)
+
+
+class ValueOperation:
+    """
+    A parsed patch value: [operator]key[,index] [arithmetic operator]= value
+    """
+
+    __slots__ = ("operator", "key", "index", "arithmetic", "value")
+
+    def __init__(self, value: ValueCollection.Value) -> None:
+        name = value.name.strip()
+        if not name:
+            raise PatchError("Empty value name")
+        self.operator = ""
+        if name[0] in VALUE_OPERATORS:
+            self.operator = name[0]
+            name = name[1:]
+        self.arithmetic = ""
+        if (
+            self.operator in ("@", "%")
+            and len(name) > 1
+            and name[-1] in ARITHMETIC_OPERATORS
+            and not name.endswith(f",{ALL}")
+        ):
+            self.arithmetic = name[-1]
+            name = name[:-1].rstrip()
+        self.index: Optional[Index] = None
+        comma = name.rfind(",")
+        if comma >= 0:
+            self.index = _parse_index(name[comma + 1 :])
+            name = name[:comma]
+        self.key = name.strip()
+        if not self.key:
+            raise PatchError(f"No value name in: {value.name}")
+        self.value = value.value
+
+    def _new_value(self, old: ValueCollection.Value) -> Optional[str]:
+        if not self.arithmetic:
+            return self.value
+        return _calculate(self.arithmetic, str(old.value), str(self.value))
+
+    def _edit(self, obj: NamedObject) -> bool:
+        values = obj.GetValues(self.key)
+        index = self.index if self.index is not None else 0
+        if index == ALL:
+            indices = list(range(len(values)))
+        elif -len(values) <= index < len(values):  # type: ignore[operator]
+            indices = [index]  # type: ignore[list-item]
+        else:
+            return False
+        for idx in indices:
+            new_value = self._new_value(values[idx])
+            if new_value is not None:
+                obj.SetValue(self.key, new_value, idx)
+        return True
+
+    def apply(self, obj: NamedObject) -> None:
+        if not self.operator:
+            obj.AddValue(self.key, self.value)
+        elif self.operator == "@":
+            self._edit(obj)
+        elif self.operator == "%":
+            if not self._edit(obj):
+                obj.AddValue(self.key, self.value)
+        elif self.operator == "&":
+            if not obj.HasValue(self.key):
+                obj.AddValue(self.key, self.value)
+        else:
+            index = self.index if self.index is not None else 0
+            if index == ALL:
+                while obj.HasValue(self.key):
+                    obj.RemoveValue(self.key)
+            else:
+                obj.RemoveValue(self.key, index)  # type: ignore[arg-type]
+
+
+def _new_object(obj_type: str) -> NamedObject:
+    # pylint: disable=protected-access
+    return NamedObject._create(obj_type)
+
+
+def _copy_object(obj: NamedObject) -> NamedObject:
+    copy = _new_object(obj.type)
+    for value in obj.values:
+        copy.AddValue(value.name, value.value)
+    for child in obj.children:
+        copy.AddChild(_copy_object(child))
+    return copy
+
+
+class Patch:
+    """
+    A parsed ModuleManager patch: the selector of the patched nodes,
+    and the operations on their values and subnodes.
+    """
+
+    __slots__ = ("selector", "values", "children", "source")
+
+    def __init__(self, source: NamedObject) -> None:
+        self.source = source
+        self.selector = Selector(source.type)
+        self.values = [ValueOperation(value) for value in source.values]
+        self.children = [Patch(child) for child in source.children]
+        for child in self.children:
+            if child.selector.pass_name is not None or child.selector.needs:
+                raise PatchError(
+                    f"Pass and :NEEDS specifiers are only allowed "
+                    f"on top-level nodes: {child.source.type}"
+                )
+
+    def apply_body(self, obj: NamedObject) -> None:
+        for operation in self.values:
+            operation.apply(obj)
+        for child in self.children:
+            child.apply_to_children(obj)
+
+    def new_object(self) -> NamedObject:
+        """
+        A new object of the selected type with the body applied;
+        it is named by the selector, unless the name is a pattern.
+        """
+        obj = _new_object(self.selector.type)
+        name = self.selector.name
+        if name and not _is_wildcard(name) and self.selector.operator:
+            obj.AddValue("name", name)
+        if self.selector.operator == "":
+            for value in self.source.values:
+                obj.AddValue(value.name, value.value)
+            for child in self.source.children:
+                obj.AddChild(_copy_object(child))
+        else:
+            self.apply_body(obj)
+        return obj
+
+    def apply_to_children(self, parent: NamedObject) -> None:
+        """Applies this subnode patch to the children of the parent"""
+        operator = self.selector.operator
+        if operator == "":
+            parent.AddChild(self.new_object())
+            return
+        children = parent.children.get_all(self.selector.type)
+        matching = self.selector.select(children, 0)
+        if operator in ("@", "%", "&"):
+            if operator == "&" and matching:
+                return
+            if not matching and operator != "@":
+                parent.AddChild(self.new_object())
+                return
+            for child in matching:
+                self.apply_body(child)
+        elif operator in ("+", "$"):
+            for child in matching:
+                copy = _copy_object(child)
+                self.apply_body(copy)
+                parent.AddChild(copy)
+        else:
+            _remove_children(parent, matching)
+
+
+def _remove_children(parent: NamedObject, removed: List[NamedObject]) -> None:
+    for child in removed:
+        for idx, other in enumerate(parent.children.get_all(child.type)):
+            if other is child:
+                parent.children.remove(child.type, idx)
+                break
+
+
+class PatchEngine:
+    """
+    Applies ModuleManager-style patches to a set of top-level nodes.
+
+    Supported are the @ (edit), + and $ (copy), ! and - (delete),
+    % (edit or create) and & (create if absent) operations on nodes,
+    the same and the arithmetic (*=, /=, +=, -=, !=, ^=) operations
+    on values, [name] patterns with * and ? wildcards and | alternatives,
+    ,index and ,* selectors, and :HAS[...] filters with @, !, # and ~
+    conditions. apply_all applies the patches in the order of their
+    :FIRST, :BEFORE, :FOR, :AFTER, :LAST and :FINAL passes, the mod passes
+    in the alphabetical order of the mods. :NEEDS[...] and the passes
+    named by a mod apply a patch only if the mod is in `mods`; :FOR
+    adds its mod to them. Pass and :NEEDS specifiers are only allowed
+    on the top-level nodes.
+
+    The nodes are indexed by type and name, so the nodes patched
+    by a selector with an exact name are found by a dict lookup, and
+    wildcard names are only matched against the distinct node names.
+    """
+
+    def __init__(
+        self, nodes: Iterable[NamedObject] = (), mods: Iterable[str] = ()
+    ) -> None:
+        # the installed mods, in lower case
+        self.mods: Set[str] = {mod.lower() for mod in mods}
+        self._next = 0
+        # type -> name -> {position in the database: node}
+        self._index: Dict[str, Dict[Optional[str], Dict[int, NamedObject]]] = {}
+        # type -> sorted names, for prefix patterns; built on demand
+        self._sorted_names: Dict[str, List[str]] = {}
+        # position in the database -> (node, its indexed name)
+        self._nodes: Dict[int, Tuple[NamedObject, Optional[str]]] = {}
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[NamedObject]:
+        """The nodes in the database order"""
+        return [node for node, _name in self._nodes.values()]
+
+    def add(self, node: NamedObject) -> None:
+        """Adds the node to the end of the database"""
+        pos = self._next
+        self._next += 1
+        name = node.GetValue("name")
+        self._nodes[pos] = (node, name)
+        self._index_node(pos, node, name)
+
+    def _index_node(self, pos: int, node: NamedObject, name: Optional[str]) -> None:
+        names = self._index.setdefault(node.type, {})
+        nodes = names.get(name)
+        if nodes is None:
+            nodes = names[name] = {}
+            self._sorted_names.pop(node.type, None)
+        nodes[pos] = node
+
+    def _unindex_node(self, pos: int, node: NamedObject, name: Optional[str]) -> None:
+        names = self._index[node.type]
+        nodes = names[name]
+        del nodes[pos]
+        if not nodes:
+            del names[name]
+            self._sorted_names.pop(node.type, None)
+
+    def _remove(self, pos: int) -> None:
+        node, name = self._nodes.pop(pos)
+        self._unindex_node(pos, node, name)
+
+    def _reindex(self, pos: int) -> None:
+        node, name = self._nodes[pos]
+        new_name = node.GetValue("name")
+        if new_name != name:
+            self._unindex_node(pos, node, name)
+            self._index_node(pos, node, new_name)
+            self._nodes[pos] = (node, new_name)
+
+    def _names_with_prefix(self, node_type: str, prefix: str) -> Iterator[str]:
+        names = self._sorted_names.get(node_type)
+        if names is None:
+            names = self._sorted_names[node_type] = sorted(
+                name for name in self._index[node_type] if name is not None
+            )
+        for i in range(bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            yield names[i]
+
+    def candidates(self, selector: Selector) -> List[Tuple[int, NamedObject]]:
+        """
+        The (position, node) pairs of the nodes with the type and the name
+        of the selector, in the database order; :HAS is not checked.
+        """
+        names = self._index.get(selector.type)
+        if not names:
+            return []
+        pattern = selector.name
+        if pattern is None:
+            found = [item for nodes in names.values() for item in nodes.items()]
+        elif not _is_wildcard(pattern):
+            found = list(names.get(pattern, {}).items())
+        elif pattern == "*":
+            found = [
+                item
+                for name, nodes in names.items()
+                if name is not None
+                for item in nodes.items()
+            ]
+        elif pattern.endswith("*") and not _is_wildcard(pattern[:-1]):
+            found = [
+                item
+                for name in self._names_with_prefix(selector.type, pattern[:-1])
+                for item in names[name].items()
+            ]
+        else:
+            regex = _compile_wildcard(pattern)
+            found = [
+                item
+                for name, nodes in names.items()
+                if name is not None and regex.match(name)
+                for item in nodes.items()
+            ]
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def apply(self, patch: Union[Patch, NamedObject, ConfigNode]) -> int:
+        """
+        Applies the patch to the database; a top-level node without
+        an operator is added to it.
+
+        :return: the number of the nodes patched, created or removed
+        """
+        patch = _as_patch(patch)
+        selector = patch.selector
+        self._declare_mod(selector)
+        if not self._enabled(selector):
+            return 0
+        operator = selector.operator
+        if not operator:
+            self.add(patch.new_object())
+            return 1
+        selected = self._select(selector)
+        if not selected and operator in ("%", "&"):
+            self.add(patch.new_object())
+            return 1
+        if operator == "&":
+            return 0
+        for pos, node in selected:
+            if operator in ("@", "%"):
+                patch.apply_body(node)
+                self._reindex(pos)
+            elif operator in ("+", "$"):
+                copy = _copy_object(node)
+                patch.apply_body(copy)
+                self.add(copy)
+            else:
+                self._remove(pos)
+        return len(selected)
+
+    def _declare_mod(self, selector: Selector) -> None:
+        if selector.pass_name == "FOR" and selector.pass_mod:
+            self.mods.add(selector.pass_mod)
+
+    def _enabled(self, selector: Selector) -> bool:
+        if selector.pass_name in _MOD_PASSES and selector.pass_mod not in self.mods:
+            return False
+        return _needs_met(selector.needs, self.mods)
+
+    def _select(self, selector: Selector) -> List[Tuple[int, NamedObject]]:
+        selected = self.candidates(selector)
+        if selector.conditions:
+            selected = [(pos, node) for pos, node in selected if selector.check(node)]
+        if selector.index is not None:
+            return _select_by_index(selected, selector.index)
+        return selected
+
+    def apply_all(
+        self, patches: Iterable[Union[Patch, NamedObject, ConfigNode]]
+    ) -> int:
+        """
+        Applies the patches in the order of their passes, and in the given
+        order within each pass.
+
+        :return: the total number of the nodes affected
+        """
+        parsed = [_as_patch(patch) for patch in patches]
+        # the mods of all the :FOR passes count as installed from the start
+        for patch in parsed:
+            self._declare_mod(patch.selector)
+        parsed.sort(key=lambda patch: patch.selector.pass_key())
+        return sum(self.apply(patch) for patch in parsed)
+
+
+def _as_patch(patch: Union[Patch, NamedObject, ConfigNode]) -> Patch:
+    if isinstance(patch, ConfigNode):
+        patch = NamedObject.from_node(patch)
+    if isinstance(patch, NamedObject):
+        patch = Patch(patch)
+    return patch
@@ -1,3 +1,4 @@
+from .multi_selector import MultiSelector
 from .search_group import SearchGroup
 from .search_query import SearchQuery
 from .search_term import SearchTerm
@@ -6,4 +7,5 @@ __all__ = [
     "SearchTerm",
     "SearchGroup",
     "SearchQuery",
+    "MultiSelector",
 ]
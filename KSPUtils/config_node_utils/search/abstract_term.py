@@ -1,4 +1,163 @@
-from KSPUtils.config_node_utils import NamedObject
+from typing import Callable, Iterable, List, Optional, Sequence, Set
+
+from KSPUtils.config_node_utils import NamedObject, PartIndex
+
+Predicate = Callable[[NamedObject], bool]
+# the rows of the PartIndex parts that may match a term, None for all of them
+Rows = Optional[Set[int]]
+
+
+def _always(_obj: NamedObject) -> bool:
+    return True
+
+
+def _never(_obj: NamedObject) -> bool:
+    return False
+
+
+def _negated(predicate: Predicate) -> Predicate:
+    def match(obj: NamedObject) -> bool:
+        return not predicate(obj)
+
+    return match
+
+
+# every that many calls an AND or OR evaluates all its predicates
+# to measure how often each of them is true, and reorders them;
+# the period doubles up to the maximum while the order stays the same
+_SAMPLE_PERIOD = 16
+_MAX_SAMPLE_PERIOD = 1024
+
+
+class _Plan:
+    """
+    The order the predicates of an AND or OR are evaluated in: the cheap
+    ones that decide the result most often go first. The costs are
+    the estimates given by the terms; the probabilities are measured.
+    """
+
+    __slots__ = ("predicates", "costs", "is_and", "order", "true", "samples", "period")
+
+    def __init__(
+        self, predicates: Sequence[Predicate], costs: Sequence[float], is_and: bool
+    ) -> None:
+        self.predicates = tuple(predicates)
+        self.costs = tuple(costs)
+        self.is_and = is_and
+        self.order = list(self.predicates)
+        self.true = [0] * len(self.predicates)
+        self.samples = 0
+        self.period = _SAMPLE_PERIOD
+        self._reorder()
+
+    def _rank(self, idx: int) -> float:
+        # the estimate of the probability to be true is 1/2 before any samples
+        p_true = (self.true[idx] + 1) / (self.samples + 2)
+        # the probability that the predicate decides the result alone
+        p_decides = 1 - p_true if self.is_and else p_true
+        return self.costs[idx] / p_decides
+
+    def _reorder(self) -> bool:
+        ranked = sorted(range(len(self.predicates)), key=self._rank)
+        order = [self.predicates[idx] for idx in ranked]
+        if order == self.order:
+            return False
+        # the list is changed in place, as the match closure holds it
+        self.order[:] = order
+        return True
+
+    def sample(self, obj: NamedObject) -> bool:
+        results = [predicate(obj) for predicate in self.predicates]
+        for idx, result in enumerate(results):
+            if result:
+                self.true[idx] += 1
+        self.samples += 1
+        if self._reorder():
+            self.period = _SAMPLE_PERIOD
+        else:
+            self.period = min(self.period * 2, _MAX_SAMPLE_PERIOD)
+        return all(results) if self.is_and else any(results)
+
+
+def all_of(
+    predicates: Sequence[Predicate], costs: Optional[Sequence[float]] = None
+) -> Predicate:
+    """
+    Short-circuit AND of the predicates. They are evaluated in the order
+    of their cost (the same for all, if not given) and of their measured
+    probability to be false.
+    """
+    if not predicates:
+        return _always
+    if len(predicates) == 1:
+        return predicates[0]
+    plan = _Plan(predicates, costs or [1.0] * len(predicates), True)
+    order = plan.order
+    countdown = plan.period
+
+    def match_all(obj: NamedObject) -> bool:
+        nonlocal countdown
+        countdown -= 1
+        if not countdown:
+            result = plan.sample(obj)
+            countdown = plan.period
+            return result
+        for predicate in order:
+            if not predicate(obj):
+                return False
+        return True
+
+    return match_all
+
+
+def any_of(
+    predicates: Sequence[Predicate], costs: Optional[Sequence[float]] = None
+) -> Predicate:
+    """
+    Short-circuit OR of the predicates, see all_of.
+    They are evaluated in the order of their cost and of their
+    measured probability to be true.
+    """
+    if not predicates:
+        return _never
+    if len(predicates) == 1:
+        return predicates[0]
+    plan = _Plan(predicates, costs or [1.0] * len(predicates), False)
+    order = plan.order
+    countdown = plan.period
+
+    def match_any(obj: NamedObject) -> bool:
+        nonlocal countdown
+        countdown -= 1
+        if not countdown:
+            result = plan.sample(obj)
+            countdown = plan.period
+            return result
+        for predicate in order:
+            if predicate(obj):
+                return True
+        return False
+
+    return match_any
+
+
+def rows_of_all(rows: Iterable[Rows]) -> Rows:
+    """The rows of the parts that may match all the terms"""
+    result: Rows = None
+    for term_rows in rows:
+        if term_rows is not None:
+            result = term_rows if result is None else result & term_rows
+    return result
+
+
+def rows_of_any(rows: Iterable[Rows]) -> Rows:
+    """The rows of the parts that may match any of the terms"""
+    result: Set[int] = set()
+    for term_rows in rows:
+        if term_rows is None:
+            return None
+        result |= term_rows
+    return result
 
 
 class AbstractTerm:
@@ -19,6 +178,55 @@ class AbstractTerm:
         m = self._match_object(obj)
         return not m if self.negative else m
 
+    def _compile(self, negate: bool) -> Predicate:
+        """
+        Returns a predicate equivalent to `match`, or to its negation
+        if negate is True.
+        """
+        match = self.match
+        if negate:
+            return _negated(match)
+        return match
+
+    # pylint: disable=no-self-use
+    def _cost(self) -> float:
+        """
+        The estimate of the relative cost of matching an object,
+        used to order the terms of the compiled ANDs and ORs.
+        """
+        return 1.0
+
+    def compile(self) -> Predicate:
+        """
+        Returns a function that is equivalent to `match`, but works faster:
+        the term tree is turned into a tree of closures once, with
+        the negations pushed down to the leaves. The terms of each AND
+        and OR are reordered, so that those that are cheap (see _cost)
+        and most often decide the result are evaluated first.
+        """
+        return self._compile(False)
+
+    # pylint: disable=unused-argument
+    def _candidates(self, index: PartIndex, negate: bool) -> Rows:
+        """
+        Returns the rows of the index parts that may match the term,
+        or its negation if negate is True, found by the index lookups only;
+        None if any of the parts may match, as for a term without an index
+        lookup of its own.
+        """
+        return None
+
+    def candidates(self, index: PartIndex) -> List[NamedObject]:
+        """
+        Returns the parts of the index that may match the term, in the order
+        they were added: a superset of the matching parts found without
+        looking at the parts themselves. Only these need to be matched.
+        """
+        # the default returns None, but the terms override it
+        # pylint: disable=assignment-from-none
+        rows = self._candidates(index, False)
+        return list(index.parts) if rows is None else index.at_rows(rows)
+
     def __str__(self):
         return "^" if self.negative else ""
 
@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from KSPUtils.config_node_utils import NamedObject
+from KSPUtils.config_node_utils.search.abstract_term import Predicate
+from KSPUtils.config_node_utils.search.search_term import SearchTerm
+
+
+class _TrieNode:
+    """
+    A node of the prefix tree of the term paths. It stands for an object
+    that has matched the path nodes leading to it: the last nodes of the
+    terms ending here select its values, and the edges are matched
+    by its children.
+    """
+
+    __slots__ = ("leaves", "edges", "_edges_by_node")
+
+    def __init__(self) -> None:
+        self.leaves: List[Tuple[int, SearchTerm.Node]] = []
+        self.edges: List[Tuple[Optional[Predicate], "_TrieNode"]] = []
+        self._edges_by_node: Dict[str, "_TrieNode"] = {}
+
+    def child(self, node: SearchTerm.Node) -> "_TrieNode":
+        key = str(node)
+        trie = self._edges_by_node.get(key)
+        if trie is None:
+            trie = self._edges_by_node[key] = _TrieNode()
+            self.edges.append((node.compile_match(), trie))
+        return trie
+
+    def select_leaves(
+        self, obj: NamedObject, results: List[SearchTerm.SelectResult]
+    ) -> None:
+        for idx, node in self.leaves:
+            if not node:
+                results[idx].append(obj)
+            else:
+                match_value = node.match_value
+                results[idx].extend(v for v in obj.values if match_value(v))
+
+    def walk(self, obj: NamedObject, results: List[SearchTerm.SelectResult]) -> None:
+        self.select_leaves(obj, results)
+        edges = self.edges
+        if not edges:
+            return
+        for child in obj.children:
+            for match, trie in edges:
+                if match is None or match(child):
+                    trie.walk(child, results)
+
+
+class MultiSelector:
+    """
+    Selects the objects of many SearchTerms at once. The paths of
+    the terms are merged into a prefix tree, so that the nodes shared
+    by them are matched only once and each object is walked only once.
+    """
+
+    def __init__(self, terms: Sequence[SearchTerm]) -> None:
+        self.terms = list(terms)
+        self._root = _TrieNode()
+        for idx, term in enumerate(self.terms):
+            trie = self._root
+            for node in term[:-1]:
+                trie = trie.child(node)
+            trie.leaves.append((idx, term[-1]))
+
+    def select(self, obj: NamedObject) -> List[SearchTerm.SelectResult]:
+        """
+        :return: the result of SearchTerm.select of every term,
+            in the order of the terms
+        """
+        results: List[SearchTerm.SelectResult] = [[] for _ in self.terms]
+        root = self._root
+        root.select_leaves(obj, results)
+        # the first nodes of the paths are matched by the object itself
+        for match, trie in root.edges:
+            if match is None or match(obj):
+                trie.walk(obj, results)
+        return results
@@ -1,4 +1,12 @@
-from KSPUtils.config_node_utils.search.abstract_term import AbstractTerm
+from KSPUtils.config_node_utils.search.abstract_term import (
+    AbstractTerm,
+    Predicate,
+    Rows,
+    all_of,
+    any_of,
+    rows_of_all,
+    rows_of_any,
+)
 from KSPUtils.config_node_utils.search.search_term import SearchTerm
 
 
@@ -10,6 +18,30 @@ class SearchGroup(list, AbstractTerm):
     def _match_object(self, obj):
         return all(t.match(obj) for t in self)
 
+    def _terms(self):
+        # the terms of nested groups are joined into one AND
+        for t in self:
+            if isinstance(t, SearchGroup) and not t.negative:
+                yield from t._terms()
+            else:
+                yield t
+
+    def _compile(self, negate: bool) -> Predicate:
+        negate = negate != self.negative
+        terms = list(self._terms())
+        predicates = [t._compile(negate) for t in terms]
+        costs = [t._cost() for t in terms]
+        # NOT (a AND b) == NOT a OR NOT b
+        return any_of(predicates, costs) if negate else all_of(predicates, costs)
+
+    def _cost(self) -> float:
+        return sum(t._cost() for t in self._terms())
+
+    def _candidates(self, index, negate: bool) -> Rows:
+        negate = negate != self.negative
+        rows = (t._candidates(index, negate) for t in self._terms())
+        return rows_of_any(rows) if negate else rows_of_all(rows)
+
     def __str__(self):
         return f"{{{AbstractTerm.__str__(self)}{' AND '.join(str(t) for t in self)}}}"
 
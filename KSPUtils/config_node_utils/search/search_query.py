@@ -1,7 +1,15 @@
 import re
 from collections import Counter
 
-from KSPUtils.config_node_utils.search.abstract_term import AbstractTerm
+from KSPUtils.config_node_utils.search.abstract_term import (
+    AbstractTerm,
+    Predicate,
+    Rows,
+    all_of,
+    any_of,
+    rows_of_all,
+    rows_of_any,
+)
 from KSPUtils.config_node_utils.search.search_group import SearchGroup
 from KSPUtils.config_node_utils.search.search_term import SearchTerm
 
@@ -16,6 +24,32 @@ class SearchQuery(AbstractTerm):
         def _match_object(self, obj):
             return self.term1.match(obj) or self.term2.match(obj)
 
+        def _terms(self):
+            # the operands of nested ORs are joined into one OR
+            for t in (self.term1, self.term2):
+                if isinstance(t, SearchGroup) and len(t) == 1 and not t.negative:
+                    t = t[0]
+                if isinstance(t, SearchQuery._Or) and not t.negative:
+                    yield from t._terms()
+                else:
+                    yield t
+
+        def _compile(self, negate: bool) -> Predicate:
+            negate = negate != self.negative
+            terms = list(self._terms())
+            predicates = [t._compile(negate) for t in terms]
+            costs = [t._cost() for t in terms]
+            # NOT (a OR b) == NOT a AND NOT b
+            return all_of(predicates, costs) if negate else any_of(predicates, costs)
+
+        def _cost(self) -> float:
+            return sum(t._cost() for t in self._terms())
+
+        def _candidates(self, index, negate: bool) -> Rows:
+            negate = negate != self.negative
+            rows = (t._candidates(index, negate) for t in self._terms())
+            return rows_of_all(rows) if negate else rows_of_any(rows)
+
         def __str__(self):
             return AbstractTerm.__str__(self) + f"{self.term1} OR {self.term2}"
 
@@ -40,6 +74,15 @@ class SearchQuery(AbstractTerm):
     def _match_object(self, obj):
         return self.root.match(obj)
 
+    def _compile(self, negate: bool) -> Predicate:
+        return self.root._compile(negate != self.negative)
+
+    def _cost(self) -> float:
+        return self.root._cost()
+
+    def _candidates(self, index, negate: bool) -> Rows:
+        return self.root._candidates(index, negate != self.negative)
+
     def __str__(self):
         return AbstractTerm.__str__(self) + str(self.root)
 
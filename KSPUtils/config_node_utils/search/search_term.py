@@ -1,9 +1,110 @@
 import re
+from functools import lru_cache
 from itertools import chain
-from typing import List, Optional, Pattern, Union
+from typing import Callable, List, Optional, Pattern, Union
 
-from KSPUtils.config_node_utils import NamedObject
-from KSPUtils.config_node_utils.search.abstract_term import AbstractTerm
+from KSPUtils.config_node_utils import NamedObject, PartIndex
+from KSPUtils.config_node_utils.objects import Module, Resource
+from KSPUtils.config_node_utils.search.abstract_term import (
+    AbstractTerm,
+    Predicate,
+    Rows,
+    _always,
+    _negated,
+    rows_of_all,
+)
+
+# the name of an object without the name value, see ValueProperty
+_NO_NAME = str(None)
+# the guesses of the average numbers of the values and the children
+# of a node, for the estimates of the costs of the terms
+_VALUES_PER_NODE = 8
+_CHILDREN_PER_NODE = 4
+
+_regex_special = frozenset(".^$*+?{}[]\\|()")
+
+Matcher = Callable[[str], bool]
+
+
+@lru_cache(maxsize=4096)
+def search_pattern(pattern: str) -> Pattern:
+    """The compiled pattern, shared by all the terms"""
+    return re.compile(pattern)
+
+
+def _is_literal(pattern: str) -> bool:
+    return not any(c in _regex_special for c in pattern)
+
+
+def _any_string(_string: str) -> bool:
+    return True
+
+
+# the most strings the result of a pattern is remembered for
+_MATCH_CACHE_SIZE = 1 << 16
+
+
+class _MatchCache(dict):
+    """
+    Remembers if the pattern matches the strings: the node types and
+    value keys are few, so most of their matches are single dict lookups.
+    """
+
+    __slots__ = ("_match",)
+
+    def __init__(self, match: Matcher) -> None:
+        super().__init__()
+        self._match = match
+
+    def __missing__(self, string: str) -> bool:
+        result = self._match(string)
+        if len(self) < _MATCH_CACHE_SIZE:
+            self[string] = result
+        return result
+
+
+def _literal_matcher(pattern: str) -> Optional[Matcher]:
+    if pattern.endswith("$") and _is_literal(pattern[:-1]):
+        # "$" also matches before the newline at the end
+        return frozenset((pattern[:-1], f"{pattern[:-1]}\n")).__contains__
+    prefix = pattern[:-2] if pattern.endswith(".*") else pattern
+    if not _is_literal(prefix):
+        return None
+    if not prefix:
+        return _any_string
+    return lambda string: string.startswith(prefix)
+
+
+def _regex_matcher(pattern: str) -> Matcher:
+    match = search_pattern(pattern).match
+    return lambda string: match(string) is not None
+
+
+def _pattern_cost(pattern: str) -> float:
+    return 1.0 if _literal_matcher(pattern) is not None else 1.5
+
+
+@lru_cache(maxsize=4096)
+def pattern_matcher(pattern: str) -> Matcher:
+    """
+    A function that tells if the pattern matches at the start of a string,
+    as pattern.match does. Literal patterns, also followed by ".*" or "$",
+    are matched without regular expressions.
+    """
+    return _literal_matcher(pattern) or _regex_matcher(pattern)
+
+
+@lru_cache(maxsize=4096)
+def key_matcher(pattern: str) -> Matcher:
+    """
+    Same as pattern_matcher, but remembers the results for the strings.
+    Only for node types and value keys: the values are too many
+    different strings to remember.
+    """
+    match = pattern_matcher(pattern)
+    if match is _any_string:
+        return match
+    return _MatchCache(match).__getitem__
 
 
 class SearchTerm(list, AbstractTerm):
@@ -13,14 +114,27 @@ class SearchTerm(list, AbstractTerm):
             node_name = nodestring.split(":")
             if len(node_name) > 2:
                 raise ValueError("Incorrect node term format. Should be Node[:name].")
-            self.node = re.compile(node_name[0])
+            self.node = search_pattern(node_name[0])
             self.name: Optional[Pattern] = (
-                None if len(node_name) < 2 else re.compile(node_name[1])
+                None if len(node_name) < 2 else search_pattern(node_name[1])
+            )
+            self._node_match = key_matcher(node_name[0])
+            self._name_match: Optional[Matcher] = (
+                None if len(node_name) < 2 else pattern_matcher(node_name[1])
             )
 
         def __bool__(self):
             return self._nonzero
 
+        def cost(self) -> float:
+            """The estimate of the relative cost of matching a string"""
+            if not self:
+                return 0.0
+            cost = _pattern_cost(self.node.pattern)
+            if self.name is not None:
+                cost += _pattern_cost(self.name.pattern)
+            return cost
+
         def __str__(self):
             if not self:
                 return ""
@@ -39,9 +153,12 @@ class SearchTerm(list, AbstractTerm):
             """
             if not self:
                 return True
-            return self.node.match(obj.type) is not None and (
-                self.name is None or self.name.match(obj.name) is not None
-            )
+            if not self._node_match(obj.type):
+                return False
+            if self._name_match is None:
+                return True
+            name = obj.name
+            return name is not None and self._name_match(name)
 
         def match_as_value(self, obj: NamedObject) -> bool:
             """
@@ -49,11 +166,91 @@ class SearchTerm(list, AbstractTerm):
             """
             if not self:
                 return True
-            if self.name is None:
-                return any(self.node.match(v.name) for v in obj.values)
-            return any(
-                self.name.match(v.value) for v in obj.values if self.node.match(v.name)
+            node_match = self._node_match
+            if self._name_match is None:
+                return any(node_match(v.name) for v in obj.values)
+            name_match = self._name_match
+            return any(name_match(v.value) for v in obj.values if node_match(v.name))
+
+        def compile_match(self) -> Optional[Predicate]:
+            """
+            Returns a predicate equivalent to `match`,
+            or None if the node matches any object.
+            """
+            if not self:
+                return None
+            node_match = self._node_match
+            name_match = self._name_match
+            if name_match is None:
+
+                def match_type(obj: NamedObject) -> bool:
+                    return node_match(obj.type)
+
+                return match_type
+
+            def match_type_and_name(obj: NamedObject) -> bool:
+                if not node_match(obj.type):
+                    return False
+                name = obj.name
+                return name is not None and name_match(name)
+
+            return match_type_and_name
+
+        def compile_match_as_value(self) -> Predicate:
+            """Returns a predicate equivalent to `match_as_value`"""
+            if not self:
+                return _always
+            node_match = self._node_match
+            name_match = self._name_match
+            if name_match is None:
+
+                def match_key(obj: NamedObject) -> bool:
+                    for v in obj.values:
+                        if node_match(v.name):
+                            return True
+                    return False
+
+                return match_key
+
+            def match_key_and_value(obj: NamedObject) -> bool:
+                for v in obj.values:
+                    if node_match(v.name) and name_match(v.value):
+                        return True
+                return False
+
+            return match_key_and_value
+
+        def name_rows(self, index: PartIndex) -> Rows:
+            """The rows of the index parts which names may match the node"""
+            name_match = self._name_match
+            if name_match is None or name_match(_NO_NAME):
+                return None
+            return index.matching_rows("name", name_match)
+
+        def key_rows(self, index: PartIndex) -> Rows:
+            """The rows of the index parts which values may match the node"""
+            if not self:
+                return None
+            return index.matching_rows("key", self._node_match)
+
+        def child_rows(self, index: PartIndex) -> Rows:
+            """The rows of the index parts which children may match the node"""
+            if not self:
+                return None
+            type_match = self._node_match
+            name_match = self._name_match
+            if name_match is None or name_match(_NO_NAME):
+                return index.matching_rows("child", type_match)
+            # only the names of the modules and resources are indexed
+            rows = index.matching_rows(
+                "child",
+                lambda t: t not in (Module.type, Resource.type) and type_match(t),
             )
+            if type_match(Module.type):
+                rows |= index.matching_rows("module", name_match)
+            if type_match(Resource.type):
+                rows |= index.matching_rows("resource", name_match)
+            return rows
 
         def match_value(self, val):
             """
@@ -63,9 +260,9 @@ class SearchTerm(list, AbstractTerm):
             """
             if not self:
                 return True
-            if self.name is None:
-                return self.node.match(val.name)
-            return self.node.match(val.name) and self.name.match(val.value)
+            if self._name_match is None:
+                return self._node_match(val.name)
+            return self._node_match(val.name) and self._name_match(val.value)
 
     def __init__(self, string: str) -> None:
         """
@@ -125,9 +322,82 @@ class SearchTerm(list, AbstractTerm):
     def _match_object(self, obj: NamedObject) -> bool:
         return self._match_path(obj, self)
 
+    @staticmethod
+    def _compile_path(path: List[Node]) -> Predicate:
+        """
+        Returns a predicate equivalent to _match_path(obj, path),
+        built from the end of the path.
+        """
+        match = path[-1].compile_match_as_value()
+        if len(path) == 1:
+            return match
+        # the last node is matched by the values of the object itself
+        node_match = path[-2].compile_match()
+        if node_match is not None:
+            match = _node_and_self(node_match, match)
+        for node in reversed(path[:-2]):
+            node_match = node.compile_match()
+            if node_match is None:
+                match = _any_child(match)
+            else:
+                match = _node_and_child(node_match, match)
+        return match
+
+    def _candidates(self, index: PartIndex, negate: bool) -> Rows:
+        if negate != self.negative:
+            return None
+        if len(self) == 1:
+            return self[0].key_rows(index)
+        # the last node is matched by the values of the part itself
+        # if the path is of two nodes, and by those of its children otherwise
+        last_rows = self[1].key_rows if len(self) == 2 else self[1].child_rows
+        return rows_of_all((self[0].name_rows(index), last_rows(index)))
+
+    def _cost(self) -> float:
+        # see _compile_path
+        cost = _VALUES_PER_NODE * self[-1].cost()
+        if len(self) > 1:
+            cost += self[-2].cost()
+        for node in reversed(self[:-2]):
+            cost = node.cost() + _CHILDREN_PER_NODE * cost
+        return cost
+
+    def _compile(self, negate: bool) -> Predicate:
+        match = self._compile_path(self)
+        return _negated(match) if negate != self.negative else match
+
     def select(self, obj: NamedObject) -> SelectResult:
         return self._select_by_path(obj, self)
 
     @classmethod
     def Convert(cls, term):
         return cls(term) if isinstance(term, str) else term
+
+
+def _node_and_self(node_match: Predicate, match: Predicate) -> Predicate:
+    def match_node(obj: NamedObject) -> bool:
+        return node_match(obj) and match(obj)
+
+    return match_node
+
+
+def _any_child(match: Predicate) -> Predicate:
+    def match_child(obj: NamedObject) -> bool:
+        for child in obj.children:
+            if match(child):
+                return True
+        return False
+
+    return match_child
+
+
+def _node_and_child(node_match: Predicate, match: Predicate) -> Predicate:
+    def match_node_child(obj: NamedObject) -> bool:
+        if not node_match(obj):
+            return False
+        for child in obj.children:
+            if match(child):
+                return True
+        return False
+
+    return match_node_child
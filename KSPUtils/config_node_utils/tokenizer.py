@@ -0,0 +1,370 @@
+import mmap
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+OPEN = 0
+VALUE = 1
+CLOSE = 2
+DEFERRED = 3
+
+Token = Tuple[int, Any]
+Buffer = Union[bytes, mmap.mmap]
+
+_braces_re = re.compile(r"([{}])")
+_buffer_braces_re = re.compile(rb"[{}]")
+# the same line boundaries str.splitlines uses, in UTF-8
+_buffer_line_break_re = re.compile(
+    rb"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]"
+)
+_node_name_strip = " \t\xef\xbb\xbf\ufeff"
+_intern = sys.intern
+
+
+class StringTable:
+    """
+    Shares equal short strings, e.g. the values of a load session:
+    True, 0, 1, the module names and the like are then stored only once.
+    Node names and value keys are always interned by the tokenizers.
+    """
+
+    __slots__ = ("_strings", "max_length")
+
+    def __init__(self, max_length=32) -> None:
+        self._strings: Dict[str, str] = {}
+        self.max_length = max_length
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __call__(self, string: str) -> str:
+        if len(string) > self.max_length:
+            return string
+        return self._strings.setdefault(string, string)
+
+
+def _segments(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yields stripped non-empty pieces of the lines with the comments removed.
+    Each "{" and "}" is yielded as a separate piece.
+    """
+    for line in lines:
+        comment = line.find("//")
+        if comment >= 0:
+            line = line[:comment]
+        if "{" in line or "}" in line:
+            for piece in _braces_re.split(line):
+                piece = piece.strip()
+                if piece:
+                    yield piece
+        else:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def tokenize(
+    lines: Iterable[str], strings: Optional[StringTable] = None
+) -> Iterator[Token]:
+    """
+    Single-pass ConfigNode tokenizer.
+
+    Yields (OPEN, node_name), (VALUE, ValueCollection.Value) and (CLOSE, None)
+    tokens. A node name is only emitted when it is directly followed by "{";
+    any other text without a single "=" in it is skipped. An unbalanced "}"
+    at the top level ends the token stream.
+
+    :param strings: if given, the values are shared through it
+    """
+    name: Optional[str] = None
+    depth = 0
+    for segment in _segments(lines):
+        if segment == "{":
+            yield OPEN, _intern(name.strip(_node_name_strip)) if name else ""
+            name = None
+            depth += 1
+        elif segment == "}":
+            if depth == 0:
+                return
+            depth -= 1
+            name = None
+            yield CLOSE, None
+        else:
+            eq = segment.find("=")
+            if eq < 0:
+                name = segment
+            elif segment.find("=", eq + 1) < 0:
+                name = None
+                value = segment[eq + 1 :].strip()
+                yield VALUE, ValueCollection.Value(
+                    _intern(segment[:eq].strip()),
+                    strings(value) if strings is not None else value,
+                )
+            else:
+                name = segment[:eq].strip()
+
+
+def _positioned_segments(lines: Sequence[str]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Same as _segments, but yields (line_index, end, piece) tuples,
+    where end is the column just after the piece in its line.
+    """
+    for line_idx, line in enumerate(lines):
+        comment = line.find("//")
+        if comment >= 0:
+            line = line[:comment]
+        if "{" in line or "}" in line:
+            end = 0
+            for piece in _braces_re.split(line):
+                end += len(piece)
+                piece = piece.strip()
+                if piece:
+                    yield line_idx, end, piece
+        else:
+            piece = line.strip()
+            if piece:
+                yield line_idx, len(line), piece
+
+
+class DeferredNode:
+    """
+    A node whose contents are not parsed yet: its name and the span
+    of the text between its braces in the source lines.
+    """
+
+    __slots__ = (
+        "name",
+        "source",
+        "start_line",
+        "start",
+        "end_line",
+        "end",
+        "strings",
+        "name_value",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        source: Sequence[str],
+        start_line: int,
+        start: int,
+        end_line: int,
+        end: int,
+        strings: Optional[StringTable] = None,
+        name_value: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.strings = strings
+        self.source = source
+        self.start_line = start_line
+        self.start = start
+        self.end_line = end_line
+        self.end = end
+        # the first name value of the node itself, found while scanning
+        # for its end, so that it is known without parsing the node
+        self.name_value = name_value
+
+    def lines(self) -> List[str]:
+        """The text of the node contents, without the braces"""
+        first = self.source[self.start_line]
+        if self.start_line == self.end_line:
+            return [first[self.start : self.end]]
+        lines = [first[self.start :]]
+        lines.extend(self.source[self.start_line + 1 : self.end_line])
+        lines.append(self.source[self.end_line][: self.end])
+        return lines
+
+
+def _name_value(piece: str) -> Optional[str]:
+    """The value of the piece if it is a name = ... value, else None"""
+    eq = piece.find("=")
+    if eq < 0 or piece.find("=", eq + 1) >= 0 or piece[:eq].strip() != "name":
+        return None
+    return piece[eq + 1 :].strip()
+
+
+def _scan_deferred(
+    lines: Sequence[str],
+    segments: Iterator[Tuple[int, int, str]],
+    strings: Optional[StringTable],
+) -> Tuple[int, int, Optional[str]]:
+    """
+    Consumes the segments up to the closing brace of a deferred node,
+    finding the name value of the node on the way.
+
+    :return: the line and the column of the closing brace
+        and the name value
+    """
+    level = 1
+    name_value = None
+    for end_line, close_end, piece in segments:
+        if piece == "{":
+            level += 1
+        elif piece == "}":
+            level -= 1
+            if level == 0:
+                return end_line, close_end - 1, name_value
+        elif name_value is None and level == 1 and piece.startswith("name"):
+            name_value = _name_value(piece)
+            if name_value is not None and strings is not None:
+                name_value = strings(name_value)
+    # an unclosed node takes the rest of the text
+    end_line = len(lines) - 1
+    return end_line, len(lines[end_line]), name_value
+
+
+def tokenize_lazy(
+    lines: Sequence[str], strings: Optional[StringTable] = None
+) -> Iterator[Token]:
+    """
+    Same as `tokenize`, but the nodes nested in the top-level nodes are
+    only scanned for their closing brace and yielded as single
+    (DEFERRED, DeferredNode) tokens instead of OPEN ... CLOSE sequences.
+    """
+    name: Optional[str] = None
+    depth = 0
+    segments = _positioned_segments(lines)
+    for line_idx, end, segment in segments:
+        if segment == "{":
+            node_name = _intern(name.strip(_node_name_strip)) if name else ""
+            name = None
+            if depth < 1:
+                yield OPEN, node_name
+                depth += 1
+                continue
+            end_line, close, name_value = _scan_deferred(lines, segments, strings)
+            yield DEFERRED, DeferredNode(
+                node_name, lines, line_idx, end, end_line, close, strings, name_value
+            )
+        elif segment == "}":
+            if depth == 0:
+                return
+            depth -= 1
+            name = None
+            yield CLOSE, None
+        else:
+            eq = segment.find("=")
+            if eq < 0:
+                name = segment
+            elif segment.find("=", eq + 1) < 0:
+                name = None
+                value = segment[eq + 1 :].strip()
+                yield VALUE, ValueCollection.Value(
+                    _intern(segment[:eq].strip()),
+                    strings(value) if strings is not None else value,
+                )
+            else:
+                name = segment[:eq].strip()
+
+
+# the value slot of ValueCollection.Value, which MappedValue.value hides
+_value_slot = vars(ValueCollection.Value)["value"]
+_get_value_slot = _value_slot.__get__
+_set_value_slot = _value_slot.__set__
+
+
+class MappedValue(ValueCollection.Value):
+    """
+    A value that keeps its raw UTF-8 text and decodes it on first access.
+
+    The raw bytes are copied out of the buffer the value was parsed from,
+    so this is not a zero-copy view of the buffer: LoadMapped closes the
+    mapping right after parsing. What is saved is decoding and stripping
+    the values that are never read. The decoded value is stored in the
+    slot of ValueCollection.Value.
+    """
+
+    __slots__ = ("_raw",)
+
+    def __init__(self, name: str, raw: bytes) -> None:
+        ValueCollection.Value.__init__(self, name, None)
+        self._raw: Optional[bytes] = raw
+
+    @property  # type: ignore[override]
+    def value(self) -> Any:
+        raw = self._raw
+        if raw is not None:
+            _set_value_slot(self, raw.decode("utf8", "replace").strip())
+            self._raw = None
+        return _get_value_slot(self, MappedValue)
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        _set_value_slot(self, value)
+        self._raw = None
+
+    def __copy__(self) -> ValueCollection.Value:
+        if self._raw is None:
+            return ValueCollection.Value(self.name, self.value, self.comment)
+        return MappedValue(self.name, self._raw)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> ValueCollection.Value:
+        return self.__copy__()
+
+    def __reduce__(self):
+        return ValueCollection.Value, (self.name, self.value, self.comment)
+
+
+def _buffer_segments(buffer: Buffer) -> Iterator[bytes]:
+    """Bytes-level counterpart of _segments"""
+    size = len(buffer)
+    start = 0
+    while start < size:
+        line_break = _buffer_line_break_re.search(buffer, start)
+        if line_break is None:
+            end = next_start = size
+        else:
+            end, next_start = line_break.span()
+        comment = buffer.find(b"//", start, end)
+        if comment >= 0:
+            end = comment
+        for brace in _buffer_braces_re.finditer(buffer, start, end):
+            brace_pos = brace.start()
+            piece = buffer[start:brace_pos].strip()
+            if piece:
+                yield piece
+            yield brace.group()
+            start = brace_pos + 1
+        piece = buffer[start:end].strip()
+        if piece:
+            yield piece
+        start = next_start
+
+
+def tokenize_buffer(buffer: Buffer) -> Iterator[Token]:
+    """
+    Tokenizes UTF-8 encoded ConfigNode text from a bytes-like buffer,
+    yielding the same tokens as `tokenize` would for the decoded text.
+    Values are yielded as MappedValue objects that are decoded lazily
+    from copies of their raw bytes, so the buffer may be closed
+    as soon as the tokens are consumed.
+    """
+    name: Optional[str] = None
+    depth = 0
+    for segment in _buffer_segments(buffer):
+        if segment == b"{":
+            yield OPEN, _intern(name.strip(_node_name_strip)) if name else ""
+            name = None
+            depth += 1
+        elif segment == b"}":
+            if depth == 0:
+                return
+            depth -= 1
+            name = None
+            yield CLOSE, None
+        else:
+            eq = segment.find(b"=")
+            if eq < 0:
+                text = segment.decode("utf8").strip()
+                # a piece made only of non-ASCII whitespace is not a piece
+                if text:
+                    name = text
+            elif segment.find(b"=", eq + 1) < 0:
+                name = None
+                key, _, raw = segment.partition(b"=")
+                yield VALUE, MappedValue(_intern(key.decode("utf8").strip()), raw)
+            else:
+                name = segment[:eq].decode("utf8").strip()
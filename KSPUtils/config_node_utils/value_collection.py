@@ -1,18 +1,38 @@
-from copy import deepcopy
-from typing import Any, List, Optional, TypeVar
+from copy import copy
+from hashlib import blake2b
+from typing import Any, Iterable, Iterator, List, Optional, TextIO, Tuple, TypeVar
 
 from KSPUtils.config_node_utils.list_dict import ListDict
 
 ValueCollectionType = TypeVar("ValueCollectionType", bound="ValueCollection")
 
 
+def _write_lines(stream: TextIO, lines: Iterator[str]) -> None:
+    first = next(lines, None)
+    if first is None:
+        return
+    stream.write(first)
+    stream.writelines(f"\n{line}" for line in lines)
+
+
 class ValueCollection:
+    __slots__ = ("values", "_version", "_hash")
+
+    # the number of changes of the collections with cached hashes,
+    # see structural_hash
+    _hash_changes = 0
+
     class Value:
+        __slots__ = ("name", "value", "comment")
+
         def __init__(self, name: str, value: Any, comment="") -> None:
             self.name = name
             self.value = value
             self.comment = comment
 
+        def __copy__(self) -> "ValueCollection.Value":
+            return ValueCollection.Value(self.name, self.value, self.comment)
+
         def __str__(self):
             s = f"{self.name} = {self.value}"
             if self.comment:
@@ -21,9 +41,121 @@ class ValueCollection:
 
     def __init__(self):
         self.values: ListDict[ValueCollection.Value] = ListDict()
+        # incremented by the methods that may change the values in place
+        self._version = 0
+        # _hash_changes, the values, their version and _version when
+        # the hash was checked, the hashes of the children and the hash
+        self._hash: Optional[Tuple[Any, ...]] = None
+
+    def _node_name(self) -> str:
+        """The name the collection is written under as a node"""
+        return ""
+
+    def _node_children(self) -> Iterable["ValueCollection"]:
+        """The collections written as the subnodes of this one"""
+        return ()
+
+    def iter_lines(self, indent="") -> Iterator[str]:
+        """
+        Yields the lines of the ConfigNode text representation.
+
+        :param indent: the prefix of every line; each nesting level
+            adds four spaces to it
+        """
+        yield f"{indent}{self._node_name()}"
+        yield f"{indent}{{"
+        children = self._node_children()
+        if not self.values and not children:
+            yield indent
+        inner = f"{indent}    "
+        for value in self.values:
+            yield f"{inner}{value}"
+        for child in children:
+            yield from child.iter_lines(inner)
+        yield f"{indent}}}"
+
+    def write_to(self, stream: TextIO) -> None:
+        """
+        Writes the text representation to the stream
+        line by line, without building the whole text in memory.
+        """
+        _write_lines(stream, self.iter_lines())
+
+    def __str__(self):
+        return "\n".join(self.iter_lines())
+
+    def structural_hash(self) -> bytes:
+        """
+        A Merkle hash of the node name, the values and the children
+        of the collection, the comments not included: collections
+        with equal hashes have the same text up to the comments.
+
+        The hash is cached and is computed again only when the values
+        of the collection or the hashes of its children have changed.
+        The children are only checked after a change of a collection
+        with a cached hash, made by its methods; changes made directly
+        through the attributes are not noticed.
+        """
+        cached = self._hash
+        changes = ValueCollection._hash_changes
+        if cached is not None and cached[0] == changes:
+            return cached[5]
+        children = b"".join(child.structural_hash() for child in self._node_children())
+        values = self.values
+        if (
+            cached is not None
+            and cached[1] is values
+            and cached[2] == values.version
+            and cached[3] == self._version
+            and cached[4] == children
+        ):
+            result = cached[5]
+        else:
+            digest = blake2b(digest_size=16)
+            digest.update(
+                "\x00".join(
+                    [self._node_name()]
+                    + [f"{value.name}\x01{value.value}" for value in values]
+                ).encode("utf8", "surrogatepass")
+            )
+            digest.update(children)
+            result = digest.digest()
+        self._hash = (changes, values, values.version, self._version, children, result)
+        return result
+
+    def _changed(self) -> None:
+        """
+        Called by the methods that change the collection. If its hash
+        is cached, the cached hashes of all the collections, possibly
+        containing this one, are checked again on their next use.
+        """
+        if self._hash is not None:
+            ValueCollection._hash_changes += 1
 
     def Clone(self: ValueCollectionType, other: ValueCollectionType) -> None:
-        self.values = deepcopy(other.values)
+        """
+        Makes this collection a copy of the other. The values are shared
+        until either collection is changed by its methods, and then only
+        that collection copies them. The values handed out by GetValues
+        and [] may still be shared, so they should be changed through
+        SetValue and SetComment.
+        """
+        self.values = other.values.share()
+        # the copy may replace the other in a collection with a cached hash
+        self._hash = other._hash
+
+    def _own_values(self, name="") -> None:
+        """
+        Called by the methods that change the values before they do it.
+
+        :param name: the name of the values that are added, removed
+            or changed, if any; NamedObject watches for renames by it
+        """
+        # pylint: disable=unused-argument
+        self._version += 1
+        self._changed()
+        if self.values.shared:
+            self.values = self.values.copy(copy)
 
     def __getitem__(self, key: str) -> Optional[Value]:
         return self.values[key]
@@ -35,9 +167,11 @@ class ValueCollection:
         return bool(self.values)
 
     def AddValue(self, name: str, value: Any) -> None:
+        self._own_values(name)
         self.values.add(name, self.Value(name, value))
 
     def AddValueItem(self, value: Value) -> None:
+        self._own_values(value.name)
         self.values.add(value.name, value)
 
     def GetValue(self, name: str, idx=0) -> Optional[Any]:
@@ -48,6 +182,7 @@ class ValueCollection:
         return self.values.get_all(name)
 
     def SetValue(self, name: str, value: Any, idx=0) -> None:
+        self._own_values(name)
         val = self.values.get(name, None, idx)
         if val is not None:
             val.value = value
@@ -55,9 +190,14 @@ class ValueCollection:
             self.values[name] = self.Value(name, value)
 
     def SetComment(self, name: str, comment: str, idx=0):
+        self._own_values()
         val = self.values.get(name, None, idx)
         if val is not None:
             val.comment = comment
 
+    def RemoveValue(self, name: str, idx=0) -> None:
+        self._own_values(name)
+        self.values.pop(name, idx, None)
+
     def HasValue(self, name: str) -> bool:
         return name in self.values
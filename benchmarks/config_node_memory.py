@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+# coding=utf-8
+
+"""
+Measures the memory taken by ConfigNode trees and Part objects
+loaded from a synthetic corpus of part configs.
+"""
+
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from KSPUtils.config_node_utils import ConfigNode, Part, StringTable  # noqa: E402
+
+MODULES = ("ModuleEngines", "ModuleGimbal", "ModuleDecouple", "ModuleCommand")
+RESOURCES = ("LiquidFuel", "Oxidizer")
+
+
+def synthetic_part(i: int) -> str:
+    lines = [
+        "PART",
+        "{",
+        f"    name = synthetic.part.{i}",
+        "    module = Part",
+        "    author = Benchmark",
+        f"    mass = {0.01 * (i % 500):.2f}",
+        f"    cost = {i % 9000}",
+        f"    title = Synthetic part #{i}",
+        f"    category = {('Propulsion', 'Utility', 'Structural')[i % 3]}",
+        "    node_stack_top = 0.0, 0.5, 0.0, 0.0, 1.0, 0.0, 1",
+        "    node_stack_bottom = 0.0, -0.5, 0.0, 0.0, -1.0, 0.0, 1",
+    ]
+    for module in MODULES:
+        lines += [
+            "    MODULE",
+            "    {",
+            f"        name = {module}",
+            "        isEnabled = True",
+            f"        key = {i % 7}",
+            "    }",
+        ]
+    for resource in RESOURCES:
+        lines += [
+            "    RESOURCE",
+            "    {",
+            f"        name = {resource}",
+            f"        amount = {i % 100}",
+            f"        maxAmount = {i % 100}",
+            "    }",
+        ]
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def deep_size(root) -> int:
+    """
+    Total size of all the objects reachable from the root,
+    each counted once.
+    """
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+
+def measure(label, build):
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size = deep_size(result)
+    print(f"{label:>12}: {size / 2 ** 20:8.1f} MiB {elapsed:6.1f} s")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--parts", type=int, default=50000, help="Number of parts to load."
+    )
+    parser.add_argument(
+        "--intern-values",
+        action="store_true",
+        help="Share equal short values of all the parts through a StringTable.",
+    )
+    parser.add_argument(
+        "--view",
+        action="store_true",
+        help="Create the parts as views of the ConfigNodes.",
+    )
+    args = parser.parse_args()
+    texts = [synthetic_part(i) for i in range(args.parts)]
+    strings = StringTable() if args.intern_values else None
+    nodes = measure(
+        "ConfigNodes", lambda: [ConfigNode.FromText(t, strings=strings) for t in texts]
+    )
+    measure(
+        "Parts",
+        lambda: [p for n in nodes for p in Part.LoadFromNode(n, args.view)],
+    )
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+# coding=utf-8
+
+"""
+Measures Part.LoadFromPath over a synthetic directory of part configs
+with different numbers of worker processes, and the time the parent
+process spends on receiving the parsed files from the workers.
+"""
+
+import argparse
+import gc
+import os
+import pickle
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from config_node_memory import synthetic_part  # noqa: E402
+
+from KSPUtils.config_node_utils import ConfigNode, LoadOptions, Part  # noqa: E402
+from KSPUtils.config_node_utils.named_object import _dump_file_nodes  # noqa: E402
+
+
+def write_corpus(path: str, num_files: int, parts_per_file: int) -> None:
+    for i in range(num_files):
+        parts = range(i * parts_per_file, (i + 1) * parts_per_file)
+        text = "\n".join(synthetic_part(p) for p in parts)
+        with open(os.path.join(path, f"part{i}.cfg"), "w", encoding="utf8") as out:
+            out.write(text)
+
+
+def measure_workers(path: str, workers: int) -> None:
+    """
+    Prints the wall time of loading all the parts and the CPU time
+    of the parent process, which bounds the speedup of the workers.
+    """
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    parts = list(Part.LoadFromPath(path, options=LoadOptions(workers=workers)))
+    elapsed = time.perf_counter() - start
+    elapsed_cpu = time.process_time() - start_cpu
+    print(
+        f"{workers:>3} workers: {len(parts)} parts {elapsed:6.2f} s, "
+        f"{elapsed_cpu:6.2f} s CPU in the parent"
+    )
+
+
+def measure_transfer(path: str) -> None:
+    """
+    Compares what the parent process does with every file parsed
+    by a worker: loading the binary nodes and creating the objects
+    as their views, or unpickling the whole object trees.
+    """
+    filepaths = [os.path.join(path, filename) for filename in os.listdir(path)]
+    blobs = [_dump_file_nodes(Part, LoadOptions(), f)[1] for f in filepaths]
+    pickles = [pickle.dumps(list(Part.LoadFromFile(f))) for f in filepaths]
+
+    def load_blobs():
+        return [
+            Part.from_node(n, True)
+            for blob in blobs
+            for n in ConfigNode.load_binary(BytesIO(blob)).subnodes
+        ]
+
+    def load_pickles():
+        return [obj for data in pickles for obj in pickle.loads(data)]
+
+    for label, results, load in (
+        ("binary", blobs, load_blobs),
+        ("pickle", pickles, load_pickles),
+    ):
+        gc.collect()
+        start = time.perf_counter()
+        objects = load()
+        elapsed = time.perf_counter() - start
+        del objects
+        size = sum(len(r) for r in results)
+        print(f"{label:>11}: {size / 2 ** 20:6.1f} MiB {elapsed:6.2f} s in the parent")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--files", type=int, default=2000, help="Number of files to load."
+    )
+    parser.add_argument(
+        "-p", "--parts-per-file", type=int, default=5, help="Number of parts per file."
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Numbers of worker processes to measure.",
+    )
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp, args.files, args.parts_per_file)
+        for num_workers in args.workers:
+            measure_workers(tmp, num_workers)
+        measure_transfer(tmp)
@@ -10,9 +10,13 @@ setup(
     url="",
     packages=find_packages(),
     python_requires=">=3.8",
+    extras_require={
+        "numpy": ["numpy"],
+    },
     scripts=[
         "grep_parts",
         "select_from_parts",
+        "diff_parts",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,314 @@
+import sys
+from io import BytesIO, StringIO
+
+import pytest
+
+from KSPUtils.config_node_utils import ConfigNode, Part, StringTable
+from KSPUtils.config_node_utils.value_collection import ValueCollection
+
+PART_TEXT = """
+// leading comment
+PART
+{
+    name = testPart // trailing comment
+    mass = 0.5
+    MODULE
+    {
+        name = ModuleEngines
+        PROPELLANT { name = LiquidFuel }
+    }
+    MODULE { name = ModuleGimbal }
+}
+"""
+
+
+def _tree(node: ConfigNode):
+    return (
+        node.name,
+        [(v.name, v.value) for v in node.values],
+        [_tree(n) for n in node.subnodes],
+    )
+
+
+def test_parse_adopts_single_root():
+    node = ConfigNode.FromText(PART_TEXT)
+    assert _tree(node) == (
+        "PART",
+        [("name", "testPart"), ("mass", "0.5")],
+        [
+            (
+                "MODULE",
+                [("name", "ModuleEngines")],
+                [("PROPELLANT", [("name", "LiquidFuel")], [])],
+            ),
+            ("MODULE", [("name", "ModuleGimbal")], []),
+        ],
+    )
+
+
+def test_parse_minified_matches_formatted():
+    minified = (
+        "PART { name = testPart\nmass = 0.5\n"
+        "MODULE { name = ModuleEngines\nPROPELLANT { name = LiquidFuel } }"
+        "MODULE { name = ModuleGimbal } }"
+    )
+    assert _tree(ConfigNode.FromText(minified)) == _tree(ConfigNode.FromText(PART_TEXT))
+
+
+def test_parse_several_braces_on_one_line():
+    # braces split a line wherever they are; the old parser could leave
+    # the last line with content unsplit, all the others were split alike
+    expected = _tree(ConfigNode.FromText("A\n{\nx = 1\n}\n{\ny = 2\n}\nz = 3"))
+    for text in (
+        "A { x = 1 } { y = 2 }\nz = 3",
+        "A\n{\nx = 1\n} {\ny = 2\n}\nz = 3",
+        "z = 3\nA { x = 1 } { y = 2 }",
+        "z = 3\nA { x = 1 } { y = 2 }\n// the last line with content is above",
+    ):
+        assert _tree(ConfigNode.FromText(text)) == expected
+    assert _tree(ConfigNode.FromText("{ { y = 2")) == ("", [], [("", [("y", "2")], [])])
+
+
+def test_parse_node_names():
+    node = ConfigNode.FromText(
+        "\ufeffA\n{\n}\n{ a = 1 }\nB = C = D\n{ }\nskipped\nb = 2"
+    )
+    assert _tree(node) == (
+        "",
+        [("b", "2")],
+        [("A", [], []), ("", [("a", "1")], []), ("B", [], [])],
+    )
+
+
+def test_parse_stops_at_unbalanced_close():
+    node = ConfigNode.FromText("a = 1\n}\nb = 2")
+    assert _tree(node) == ("", [("a", "1")], [])
+
+
+def test_iterparse_events():
+    events = list(ConfigNode.iterparse(StringIO("A\n{\na = 1\nB { b = 2 }\n}\nc = 3")))
+    assert [(e, p if isinstance(p, str) else (p.name, p.value)) for e, p in events] == [
+        ("start", "A"),
+        ("value", ("a", "1")),
+        ("start", "B"),
+        ("value", ("b", "2")),
+        ("end", "B"),
+        ("end", "A"),
+        ("value", ("c", "3")),
+    ]
+
+
+def test_iterparse_materialize_nodes():
+    events = list(ConfigNode.iterparse(StringIO(PART_TEXT + PART_TEXT), ("PART",)))
+    assert [e for e, _ in events] == ["node", "node"]
+    assert _tree(events[0][1]) == _tree(ConfigNode.FromText(PART_TEXT))
+
+
+def test_load_mapped_matches_load(tmp_path):
+    path = tmp_path / "part.cfg"
+    path.write_text(PART_TEXT + "\r\nA { b = ü = c\r\n c = d }", encoding="utf8")
+    mapped = ConfigNode.LoadMapped(path)
+    assert mapped.subnodes[0].values[0]._raw is not None
+    assert _tree(mapped) == _tree(ConfigNode.Load(str(path)))
+    value = mapped.subnodes[0].values[0]
+    assert value._raw is None
+    value.value = "other"
+    assert (value.value, value._raw) == ("other", None)
+
+
+def test_load_mapped_closes_files(tmp_path):
+    resource = pytest.importorskip("resource")
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = 64
+    paths = []
+    for idx in range(limit * 2):
+        path = tmp_path / f"part{idx}.cfg"
+        path.write_text(PART_TEXT, encoding="utf8")
+        paths.append(path)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    try:
+        nodes = [ConfigNode.LoadMapped(path) for path in paths]
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    assert all(_tree(node) == _tree(nodes[0]) for node in nodes)
+    assert nodes[0].GetValue("name") == "testPart"
+
+
+def test_str_and_write_to():
+    node = ConfigNode.FromText("A { a = 1\nB { }\nC { c = 2 } }")
+    text = "A\n{\n    a = 1\n    B\n    {\n    \n    }\n    C\n    {\n        c = 2\n    }\n}"
+    assert str(node) == text
+    out = StringIO()
+    node.write_to(out)
+    assert out.getvalue() == text
+    values = ValueCollection()
+    values.AddValue("a", "1")
+    assert str(values) == "\n{\n    a = 1\n}"
+    assert values.structural_hash()
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "part.cfg")
+    node = ConfigNode.FromText(PART_TEXT)
+    node.Save(path)
+    assert _tree(ConfigNode.Load(path)) == _tree(node)
+
+
+def test_named_object_str():
+    part = next(Part.LoadFromStream(StringIO(PART_TEXT)))
+    assert str(part) == str(ConfigNode.FromText(PART_TEXT))
+
+
+def test_binary_round_trip():
+    node = ConfigNode.FromText(PART_TEXT + "\nPART { name = ü\nname = ü // c\n}")
+    node.subnodes[0].SetComment("mass", "comment")
+    out = BytesIO()
+    node.dump_binary(out)
+    out.seek(0)
+    loaded = ConfigNode.load_binary(out)
+    assert str(loaded) == str(node)
+    assert [v.value for v in loaded.subnodes[1].GetValues("name")] == ["ü", "ü"]
+    # names and keys are interned like by the tokenizers, values are shared
+    # through the table
+    strings = StringTable()
+    out.seek(0)
+    loaded = ConfigNode.load_binary(out, strings)
+    part = loaded.subnodes[0]
+    assert part.name is sys.intern("".join(["PA", "RT"]))
+    assert part["mass"].name is sys.intern("".join(["ma", "ss"]))
+    assert part.GetValue("mass") is strings("".join(["0.", "5"]))
+
+
+def test_clone_copy_on_write():
+    original = ConfigNode.FromText(PART_TEXT)
+    text = str(original)
+    clone = ConfigNode()
+    clone.Clone(original)
+    assert str(clone) == text
+    clone.SetValue("mass", "1.5")
+    clone.AddValue("cost", "10")
+    clone.GetNode("MODULE").SetValue("name", "ModuleRCS")
+    clone.GetNode("MODULE").GetNode("PROPELLANT").SetComment("name", "fuel")
+    clone.AddNode("RESOURCE")
+    assert str(original) == text
+    original.GetNode("MODULE", 1).AddValue("gimbalRange", "1")
+    assert original.GetNode("MODULE", 1).GetValue("gimbalRange") == "1"
+    assert clone.GetNode("MODULE", 1).GetValue("gimbalRange") is None
+    assert clone.GetValue("mass") == "1.5"
+    assert clone.GetNode("MODULE").GetValue("name") == "ModuleRCS"
+    assert original.GetNode("MODULE").GetValue("name") == "ModuleEngines"
+
+
+def test_clone_reads_do_not_copy():
+    original = ConfigNode.FromText(PART_TEXT)
+    text = str(original)
+    clone = ConfigNode()
+    clone.Clone(original)
+    values, version = clone.values, clone.values.version
+    assert clone.GetValues("mass")[0] is original.GetValues("mass")[0]
+    assert clone["name"] is original["name"]
+    assert clone.values is values and values.version == version and values.shared
+    module = clone.GetNode("MODULE")
+    assert module is not original.GetNode("MODULE")
+    # only the node handed out is copied, and it still shares its values
+    assert module.values.shared
+    assert clone.subnodes[1] is original.subnodes[1]
+    module.SetValue("name", "ModuleRCS")
+    clone.SetComment("mass", "comment")
+    assert str(original) == text
+    assert clone.GetNode("MODULE") is module
+    assert clone.GetNodes("MODULE")[0] is module
+    assert clone.GetNode("MODULE").GetValue("name") == "ModuleRCS"
+    assert clone.values[1].comment == "comment"
+
+
+def test_lazy_parse_defers_subnodes():
+    node = ConfigNode.FromText(PART_TEXT + "}\nignored { }", lazy=True)
+    assert not node.parsed
+    assert node.GetValue("mass") == "0.5"
+    assert node
+    assert not node.parsed
+    assert _tree(node) == _tree(ConfigNode.FromText(PART_TEXT))
+    assert node.parsed
+
+
+def test_lazy_clone_and_named_object():
+    node = ConfigNode.FromText(PART_TEXT, lazy=True)
+    clone = ConfigNode()
+    clone.Clone(node)
+    clone.AddNode("RESOURCE")
+    assert len(clone.subnodes) == 3
+    assert not node.parsed
+    part = Part.from_node(node)
+    assert not node.parsed
+    assert str(part) == str(ConfigNode.FromText(PART_TEXT))
+
+
+def test_remove_value_and_node():
+    original = ConfigNode.FromText(PART_TEXT)
+    text = str(original)
+    node = ConfigNode()
+    node.Clone(original)
+    node.RemoveValue("mass")
+    node.RemoveValue("missing")
+    node.RemoveNode("MODULE", 1)
+    node.GetNode("MODULE").RemoveNode("PROPELLANT")
+    assert str(original) == text
+    assert _tree(node) == (
+        "PART",
+        [("name", "testPart")],
+        [("MODULE", [("name", "ModuleEngines")], [])],
+    )
+
+
+def test_parse_interns_names_and_keys():
+    strings = StringTable(max_length=8)
+    text = "".join(
+        f"PART {{ {'m' + 'ass'} = 0.5\ntitle = {'x' * 10}\n }}" for _ in "ab"
+    )
+    for lazy in (False, True):
+        first, second = ConfigNode.FromText(text, lazy, strings).subnodes
+        assert first.name is second.name
+        assert first.values[0].name is second.values[0].name
+        assert first.values[0].value is second.values[0].value
+        assert first.values[1].value is not second.values[1].value
+    assert len(strings) == 1
+
+
+def test_named_object_view():
+    node = ConfigNode.FromText(PART_TEXT)
+    text = str(node)
+    part = Part.from_node(node, view=True)
+    assert part.values.shared and part._source is not None
+    assert str(part) == text
+    part.mass = 1.5
+    part.modules["ModuleEngines"].AddValue("thrust", "10")
+    part.SetValue("name", "otherPart")
+    assert str(node) == text
+    assert part.mass == 1.5
+    node.AddValue("cost", "10")
+    assert part.GetValue("cost") is None
+
+
+def test_named_object_does_not_follow_node():
+    for lazy in (False, True):
+        node = ConfigNode.FromText(PART_TEXT, lazy)
+        text = str(ConfigNode.FromText(PART_TEXT))
+        for view in (False, True) if lazy else (True,):
+            part = Part.from_node(node, view)
+            node.AddNode("RESOURCE")
+            node.GetNode("MODULE").SetValue("name", "ModuleRCS")
+            node.RemoveNode("MODULE", 1)
+            assert str(part) == text
+            assert list(part.modules) == ["ModuleEngines", "ModuleGimbal"]
+            node = ConfigNode.FromText(PART_TEXT, lazy)
+
+
+def test_named_object_write_to_matches_node():
+    node = ConfigNode.FromText(PART_TEXT + "\nPART { }", lazy=True)
+    for n in node.subnodes:
+        for view in (False, True):
+            part = Part.from_node(n, view)
+            out = StringIO()
+            part.write_to(out)
+            assert out.getvalue() == str(part) == str(n)
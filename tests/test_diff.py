@@ -0,0 +1,78 @@
+from KSPUtils.config_node_utils import ConfigNode, Part, ValueCollection
+from KSPUtils.config_node_utils.diff import diff, iter_report
+
+OLD = """
+PART { name = a
+mass = 1 // comment
+MODULE { name = ModuleEngines
+maxThrust = 100 }
+MODULE { name = ModuleGimbal }
+}
+PART { name = b }
+PART { name = c }
+"""
+
+NEW = """
+PART { name = a
+mass = 2
+tag = x
+MODULE { name = ModuleEngines
+maxThrust = 200 }
+MODULE { name = ModuleRCS }
+}
+PART { name = c // only a comment is changed
+}
+PART { name = d }
+"""
+
+
+def _parts(text, view=False):
+    return list(Part.LoadFromNode(ConfigNode.FromText(text), view))
+
+
+def test_structural_hash():
+    node = ConfigNode.FromText(OLD)
+    other = ConfigNode.FromText(OLD.replace("// comment", ""), lazy=True)
+    assert node.structural_hash() == other.structural_hash()
+    assert Part.from_node(node.subnodes[0], True).structural_hash() == (
+        node.subnodes[0].structural_hash()
+    )
+    node.subnodes[0].GetNode("MODULE").SetValue("maxThrust", "101")
+    assert node.structural_hash() != other.structural_hash()
+
+
+def test_diff_parts():
+    result = diff(_parts(OLD), _parts(NEW, view=True))
+    assert [p.name for p in result.added] == ["d"]
+    assert [p.name for p in result.removed] == ["b"]
+    assert result.unchanged == 1
+    (part_diff,) = result.changed
+    assert part_diff.label == "PART[a]"
+    assert list(iter_report(part_diff)) == [
+        "~ mass = 1 -> 2",
+        "+ tag = x",
+        "+ MODULE[ModuleRCS]",
+        "- MODULE[ModuleGimbal]",
+        "~ MODULE[ModuleEngines]",
+        "    ~ maxThrust = 100 -> 200",
+    ]
+
+
+def test_structural_hash_follows_changes():
+    node = ConfigNode.FromText(OLD)
+    clone = ConfigNode()
+    clone.Clone(node)
+    part = Part.from_node(node.subnodes[0], view=True)
+    hashes = node.structural_hash(), clone.structural_hash(), part.structural_hash()
+    changes = ValueCollection._hash_changes
+    node.GetNodes("PART")
+    ConfigNode.FromText(OLD).GetNode("PART").SetValue("mass", "3")
+    assert ValueCollection._hash_changes == changes
+    # the children are created or copied after the hashes are cached
+    part.modules["ModuleEngines"].SetValue("maxThrust", "101")
+    assert part.structural_hash() != hashes[2]
+    clone.GetNode("PART").GetNode("MODULE").SetValue("maxThrust", "101")
+    assert clone.structural_hash() != hashes[1]
+    assert node.structural_hash() == hashes[0]
+    part.modules["ModuleEngines"].SetValue("maxThrust", "100")
+    assert part.structural_hash() == hashes[2]
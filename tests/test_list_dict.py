@@ -0,0 +1,58 @@
+from KSPUtils.config_node_utils.list_dict import ListDict
+
+
+def _list_dict(*items):
+    ld: ListDict[int] = ListDict()
+    for key, value in items:
+        ld.add(key, value)
+    return ld
+
+
+def test_list_dict_unique_and_duplicate_keys():
+    ld = _list_dict(("a", 1), ("b", 2), ("a", 3), ("a", 4))
+    assert list(ld) == [1, 2, 3, 4]
+    assert ld["a"] == ld.get("a") == 1
+    assert ld.get("a", idx=2) == ld.get("a", idx=-1) == 4
+    assert ld.get("b", idx=-1) == 2
+    assert ld.get("b", idx=1) is None
+    assert ld.get("c", 0) == 0
+    assert ld.get_all("a") == [1, 3, 4]
+    assert ld.get_all("b") == [2]
+    assert ld.get_all("c") == []
+    ld["b"] = 5
+    ld["c"] = 6
+    assert list(ld) == [1, 5, 3, 4, 6]
+    assert ld.keys() == ["a", "b", "c"]
+
+
+def test_list_dict_remove_and_insert():
+    ld = _list_dict(*((k, i) for i, k in enumerate("abacadaeaf")))
+    assert ld.pop("a", 1) == 2
+    ld.remove("b")
+    assert ld.pop("x", default=None) is None
+    assert list(ld) == [0, 3, 4, 5, 6, 7, 8, 9]
+    assert ld.get_all("a") == [0, 4, 6, 8]
+    ld.insert(1, "a", 10)
+    ld.insert(-1, "g", 11)
+    ld.insert(100, "b", 12)
+    assert list(ld) == [0, 10, 3, 4, 5, 6, 7, 8, 11, 9, 12]
+    assert ld.get_all("a") == [0, 10, 4, 6, 8]
+    assert ld[1] == 10 and ld["g"] == 11 and ld["f"] == 9
+    for _ in range(5):
+        ld.remove("a", -1)
+    assert "a" not in ld
+    assert len(ld) == 6 and list(ld) == [3, 5, 7, 11, 9, 12]
+
+
+def test_list_dict_remove_many():
+    ld = _list_dict(*((str(i % 7), i) for i in range(1000)))
+    shared = ld.share()
+    for i in range(0, 1000, 3):
+        key = str(i % 7)
+        ld.remove(key, ld.get_all(key).index(i))
+    expected = [i for i in range(1000) if i % 3]
+    assert len(shared) == 1000
+    assert list(ld) == expected
+    for key in "0123456":
+        assert ld.get_all(key) == [i for i in expected if str(i % 7) == key]
+    assert ld.copy()[5] == expected[5]
@@ -0,0 +1,174 @@
+import pytest
+
+from KSPUtils.config_node_utils import (
+    ConfigNode,
+    LoadOptions,
+    Module,
+    Part,
+    PartIndex,
+)
+from KSPUtils.config_node_utils.named_object import prefetch
+
+
+def _write_parts(path, num_files):
+    for i in range(num_files):
+        (path / f"part{i}.cfg").write_text(
+            f"PART {{ name = part{i}\nmass = {i}\nMODULE {{ name = M{i} }} }}",
+            encoding="utf8",
+        )
+
+
+def test_load_from_path_parallel(tmp_path):
+    _write_parts(tmp_path, 20)
+    sequential = [str(p) for p in Part.LoadFromPath(str(tmp_path))]
+    assert len(sequential) == 20
+    ordered = [
+        str(p) for p in Part.LoadFromPath(str(tmp_path), options=LoadOptions(workers=2))
+    ]
+    assert ordered == sequential
+    unordered = [
+        str(p)
+        for p in Part.LoadFromPath(
+            str(tmp_path), options=LoadOptions(workers=2, ordered=False)
+        )
+    ]
+    assert sorted(unordered) == sorted(sequential)
+
+
+def test_load_from_path_parallel_strings(tmp_path):
+    for i in range(4):
+        (tmp_path / f"part{i}.cfg").write_text(
+            f"PART {{ name = part{i}\nauthor = Squad }}", encoding="utf8"
+        )
+    parts = list(
+        Part.LoadFromPath(
+            str(tmp_path), options=LoadOptions(workers=2, intern_values=True)
+        )
+    )
+    assert sorted(p.name for p in parts) == [f"part{i}" for i in range(4)]
+    # the values of all the files are shared through one StringTable
+    assert len({id(p.GetValue("author")) for p in parts}) == 1
+
+
+def test_children_dict_view_invalidation():
+    part = Part.from_node(
+        ConfigNode.FromText(
+            "PART { MODULE { name = A }\nMODULE { name = B }\nRESOURCE { name = R } }"
+        )
+    )
+    modules = part.modules
+    assert list(modules) == ["A", "B"]
+    assert list(part.resources) == ["R"]
+    assert part.modules["A"] is modules["A"]
+    module = Module()
+    module.name = "C"
+    part.AddChild(module)
+    assert list(part.modules) == ["A", "B", "C"]
+    part.modules["A"].name = "D"
+    assert list(part.modules) == ["D", "B", "C"]
+    part.children.remove("MODULE", 1)
+    assert list(part.modules) == ["D", "C"]
+    modules = part.modules
+    part.SetValue("mass", "1")
+    part.resources["R"].SetValue("amount", "1")
+    Part.from_node(ConfigNode.FromText("PART { }")).AddChild(Module())
+    assert part.modules is modules
+    part.modules["C"].SetValue("name", "E")
+    assert list(part.modules) == ["D", "E"]
+    assert isinstance(part.modules, dict)
+    part.modules["D"].load(ConfigNode.FromText("MODULE { name = F }"))
+    assert list(part.modules) == ["F", "E"]
+
+
+def test_value_property_cache_and_prefetch():
+    parts = [
+        Part.from_node(ConfigNode.FromText(f"PART {{ name = p{i}\nmass = {i} }}"))
+        for i in range(3)
+    ]
+    assert prefetch(parts, "name", "mass", "cost") == [
+        (f"p{i}", float(i), None) for i in range(3)
+    ]
+    part = parts[1]
+    assert part.mass == 1.0
+    part.mass = "2.5"
+    assert part.mass == 2.5
+    part.values["mass"].value = "3"
+    assert part.mass == 3.0
+    part.AddValue("cost", "10")
+    assert part.cost == 10.0
+    part.RemoveValue("cost")
+    assert part.cost is None
+
+
+def test_load_from_path_builds_index(tmp_path):
+    _write_parts(tmp_path, 3)
+    (tmp_path / "tank.cfg").write_text(
+        "PART { name = tank\nRESOURCE { name = LiquidFuel }\nMODULE { name = M0 } }"
+        "PART { name = part1 }",
+        encoding="utf8",
+    )
+    index = PartIndex()
+    parts = list(Part.LoadFromPath(str(tmp_path), index=index))
+    assert index.parts == parts
+    tank = index.get("tank")
+    assert tank is not None and tank.name == "tank"
+    assert index.source(tank) == str(tmp_path / "tank.cfg")
+    assert sorted(index.sources("part1")) == sorted(
+        [str(tmp_path / "part1.cfg"), str(tmp_path / "tank.cfg")]
+    )
+    assert [p.name for p in index.with_module("M0")] == [
+        p.name for p in parts if p.name in ("part0", "tank")
+    ]
+    assert index.with_resource("LiquidFuel") == [tank]
+    assert len(index.with_value("mass")) == 3
+    assert len(index.with_child("MODULE")) == 4
+    assert index.with_module("M9") == []
+    assert "part2" in index and "part9" not in index
+
+
+def test_part_index_does_not_create_children(tmp_path):
+    (tmp_path / "parts.cfg").write_text(
+        "PART { name = tank\nRESOURCE { name = LiquidFuel }\n"
+        "MODULE { name = M0\nPROPELLANT { name = P } }\n"
+        "MODULE { PROPELLANT { name = P } name = M1 } }",
+        encoding="utf8",
+    )
+    for lazy in (False, True):
+        index = PartIndex()
+        parts = list(
+            Part.LoadFromPath(
+                str(tmp_path), options=LoadOptions(lazy=lazy, view=True), index=index
+            )
+        )
+        # pylint: disable=protected-access
+        assert parts[0]._source is not None
+        assert index.with_module("M0") == parts
+        assert index.with_module("M1") == parts
+        assert index.with_module("P") == []
+        assert index.with_resource("LiquidFuel") == parts
+        assert len(index.with_child("MODULE")) == 1
+        assert parts[0]._source is not None
+        assert list(parts[0].modules) == ["M0", "M1"]
+
+
+def test_part_index_update():
+    index = PartIndex()
+    parts = [
+        Part.from_node(ConfigNode.FromText(f"PART {{ name = p{i}\nmass = 1 }}"))
+        for i in range(3)
+    ]
+    for part in parts:
+        index.add(part, "parts.cfg")
+    parts[0].name = "p2"
+    parts[0].RemoveValue("mass")
+    module = Module()
+    module.name = "M"
+    parts[0].AddChild(module)
+    index.update(parts[0])
+    assert index.named("p2") == [parts[0], parts[2]]
+    assert "p0" not in index
+    assert index.with_value("mass") == parts[1:]
+    assert index.with_module("M") == [parts[0]]
+    assert index.source(parts[0]) == "parts.cfg"
+    with pytest.raises(KeyError):
+        index.update(Part())
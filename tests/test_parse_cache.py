@@ -0,0 +1,72 @@
+import os
+
+from KSPUtils.config_node_utils import ConfigNode, StringTable
+from KSPUtils.config_node_utils.parse_cache import ParseCache
+
+
+def _counting_parse(calls):
+    def parse(path):
+        calls.append(path)
+        return ConfigNode.Load(path)
+
+    return parse
+
+
+def test_parse_cache_hit_and_invalidation(tmp_path):
+    cfg = tmp_path / "part.cfg"
+    cfg.write_text("PART { name = a }", encoding="utf8")
+    cache = ParseCache(tmp_path / "cache")
+    calls = []
+    parse = _counting_parse(calls)
+    assert cache.load(cfg, parse).GetValue("name") == "a"
+    assert cache.load(cfg, parse).GetValue("name") == "a"
+    assert len(calls) == 1
+    cfg.write_text("PART { name = bb }", encoding="utf8")
+    assert cache.load(cfg, parse).GetValue("name") == "bb"
+    assert len(calls) == 2
+
+
+def test_parse_cache_corrupted_entry(tmp_path):
+    cfg = tmp_path / "part.cfg"
+    cfg.write_text("PART { name = a }", encoding="utf8")
+    cache = ParseCache(tmp_path / "cache")
+    calls = []
+    cache.load(cfg, _counting_parse(calls))
+    for entry in (tmp_path / "cache").iterdir():
+        entry.write_bytes(b"garbage")
+    assert ConfigNode.Load(str(cfg), cache).GetValue("name") == "a"
+
+
+def test_parse_cache_hit_shares_strings(tmp_path):
+    cfg = tmp_path / "part.cfg"
+    cfg.write_text("PART { title = Some Part }", encoding="utf8")
+    cache = ParseCache(tmp_path / "cache")
+    ConfigNode.Load(str(cfg), cache)
+    strings = StringTable()
+    title = strings("Some Part")
+    node = ConfigNode.Load(str(cfg), cache, strings=strings)
+    assert node.GetValue("title") is title
+
+
+def test_parse_cache_stale_entry(tmp_path):
+    cfg = tmp_path / "part.cfg"
+    cfg.write_text("PART { name = a }", encoding="utf8")
+    cache = ParseCache(tmp_path / "cache")
+    cache.load(cfg, ConfigNode.Load)
+    (entry,) = (tmp_path / "cache").iterdir()
+    data = entry.read_bytes()
+    # an entry of another version of the file is not read at all
+    os.utime(cfg, ns=(0, 0))
+    calls = []
+    cache.load(cfg, _counting_parse(calls))
+    assert len(calls) == 1
+    assert entry.read_bytes() != data
+
+
+def test_parse_cache_eviction(tmp_path):
+    cache = ParseCache(tmp_path / "cache", max_size=1)
+    for i in range(3):
+        cfg = tmp_path / f"part{i}.cfg"
+        cfg.write_text(f"PART {{ name = p{i} }}", encoding="utf8")
+        cache.load(cfg, ConfigNode.Load)
+    assert len(os.listdir(tmp_path / "cache")) <= 1
@@ -0,0 +1,48 @@
+import pytest
+
+from KSPUtils.config_node_utils import ConfigNode, LoadOptions, Part
+
+np = pytest.importorskip("numpy")
+
+# pylint: disable=wrong-import-position
+from KSPUtils.config_node_utils.part_table import PartTable  # noqa: E402
+
+PARTS = """
+PART { name = tank\ncategory = FuelTank\nmass = 0.5\ncost = 100
+    RESOURCE { name = LiquidFuel\namount = 90\nmaxAmount = 100 }
+    MODULE { name = ModuleFuelTank } }
+PART { name = engine\ncategory = Engine\nmass = 1.5\ncost = 400
+    MODULE { name = ModuleEngines }\nMODULE { name = ModuleGimbal } }
+PART { name = adapter\nmass = 0.25
+    MODULE { name = ModuleFuelTank }\nMODULE { } }
+"""
+
+
+def test_part_table_columns():
+    parts = list(Part.LoadFromNode(ConfigNode.FromText(PARTS)))
+    table = PartTable.from_parts(
+        iter(parts), ("name", "category", "mass", "cost"), ("LiquidFuel",)
+    )
+    assert len(table) == 3
+    assert table.categories("name") == ["tank", "engine", "adapter"]
+    assert table["category"].tolist() == [0, 1, -1]
+    np.testing.assert_array_equal(table["mass"], [0.5, 1.5, 0.25])
+    np.testing.assert_array_equal(table["cost"], [100, 400, np.nan])
+    np.testing.assert_array_equal(table["LiquidFuel.amount"], [90, 0, 0])
+    np.testing.assert_array_equal(table["LiquidFuel.maxAmount"], [100, 0, 0])
+    assert table.module_names == ["ModuleFuelTank", "ModuleEngines", "ModuleGimbal"]
+    assert table.module_offsets.tolist() == [0, 1, 3, 4]
+    assert table.select(table.has_module("ModuleFuelTank")) == [parts[0], parts[2]]
+    assert table.select(table.equals("category", "Engine")) == [parts[1]]
+    assert not table.has_module("ModuleRCS").any()
+    assert not table.equals("category", "Pods").any()
+
+
+def test_part_table_from_path(tmp_path):
+    (tmp_path / "parts.cfg").write_text(PARTS, encoding="utf8")
+    table = PartTable.from_path(
+        str(tmp_path), ("name", "mass"), options=LoadOptions(lazy=True, view=True)
+    )
+    assert table.categories("name") == ["tank", "engine", "adapter"]
+    np.testing.assert_array_equal(table["mass"], [0.5, 1.5, 0.25])
+    assert table.module_offsets.tolist() == [0, 1, 3, 4]
@@ -0,0 +1,181 @@
+import pytest
+
+from KSPUtils.config_node_utils import ConfigNode, Part
+from KSPUtils.config_node_utils.patch_engine import PatchEngine, PatchError, Selector
+
+PARTS = """
+PART { name = tank1\nmass = 0.5\ncost = 100\ntag = a\ntag = b
+    RESOURCE { name = LiquidFuel\namount = 90\nmaxAmount = 90 } }
+PART { name = tank2\nmass = 1\ncost = 200
+    RESOURCE { name = LiquidFuel\namount = 180\nmaxAmount = 180 }
+    MODULE { name = ModuleFuelTank } }
+PART { name = engine\nmass = 2
+    MODULE { name = ModuleEngines\nPROPELLANT { name = LiquidFuel } }
+    MODULE { name = ModuleGimbal } }
+"""
+
+
+def _engine():
+    return PatchEngine(Part.LoadFromNode(ConfigNode.FromText(PARTS)))
+
+
+def _apply(engine, text):
+    root = ConfigNode.FromText(text)
+    nodes = root.subnodes if not root.name else [root]
+    return engine.apply_all(nodes)
+
+
+def _part(engine, name):
+    return next(p for p in engine.nodes if p.name == name)
+
+
+def test_edit_values_with_wildcards_and_has():
+    engine = _engine()
+    assert (
+        _apply(
+            engine,
+            "@PART[tank*]:HAS[@RESOURCE[LiquidFuel]]:FOR[Test] "
+            "{ @mass *= 2\n@cost += 5\n%dryCost = 1\n@tag,* = c }",
+        )
+        == 2
+    )
+    assert _part(engine, "tank1").mass == 1.0
+    assert _part(engine, "tank2").cost == 205.0
+    assert _part(engine, "tank2").GetValue("dryCost") == "1"
+    assert [v.value for v in _part(engine, "tank1").GetValues("tag")] == ["c", "c"]
+    assert (
+        _apply(
+            engine, "@PART[*]:HAS[#mass[>1.5],!MODULE[ModuleFuelTank]] { &cost = 50 }"
+        )
+        == 1
+    )
+    assert _part(engine, "engine").cost == 50.0
+    assert _apply(engine, "@PART[tank1|engine]:HAS[~cost[]] { @mass = 0 }") == 0
+    assert _apply(engine, "@PART[tank?] { !tag,* = del\n@name ^= :tank:barrel: }") == 2
+    assert [p.name for p in engine.nodes] == ["barrel1", "barrel2", "engine"]
+    assert not _part(engine, "barrel1").HasValue("tag")
+    assert _apply(engine, "@PART[barrel2] { @mass = 3 }") == 1
+    assert _part(engine, "barrel2").mass == 3.0
+
+
+def test_node_operations():
+    engine = _engine()
+    _apply(
+        engine,
+        "+PART[tank2] { @name = tank3\n@RESOURCE[LiquidFuel] { @amount /= 2 } }\n"
+        "!PART[tank1] { }\n"
+        "@PART[engine] {\n"
+        "  @MODULE[ModuleEngines] { @PROPELLANT[*] { %ratio = 0.9 } }\n"
+        "  !MODULE[ModuleGimbal] { }\n"
+        "  %MODULE[ModuleDecouple] { ejectionForce = 10 }\n"
+        "  +MODULE[ModuleEngines] { @name = ModuleEnginesFX }\n"
+        "  MODULE { name = ModuleTestSubject }\n"
+        "}\n"
+        "PART { name = new }",
+    )
+    assert [p.name for p in engine.nodes] == ["tank2", "engine", "tank3", "new"]
+    assert _part(engine, "tank3").resources["LiquidFuel"].amount == 90.0
+    assert _part(engine, "tank2").resources["LiquidFuel"].amount == 180.0
+    engine_part = _part(engine, "engine")
+    assert list(engine_part.modules) == [
+        "ModuleEngines",
+        "ModuleDecouple",
+        "ModuleEnginesFX",
+        "ModuleTestSubject",
+    ]
+    assert engine_part.modules["ModuleDecouple"].GetValue("ejectionForce") == "10"
+    propellant = engine_part.modules["ModuleEnginesFX"].children[0]
+    assert propellant.GetValue("ratio") == "0.9"
+    assert isinstance(engine.nodes[-1], Part)
+
+
+def test_candidates_are_indexed():
+    engine = _engine()
+    assert [p.name for _, p in engine.candidates(Selector("@PART[engine]"))] == [
+        "engine"
+    ]
+    assert [p.name for _, p in engine.candidates(Selector("@PART[*2|eng*]"))] == [
+        "tank2",
+        "engine",
+    ]
+    assert engine.candidates(Selector("@MODULE[engine]")) == []
+    with pytest.raises(PatchError):
+        Selector("@PART[x]:UNKNOWN")
+
+
+def test_exact_names_do_not_match_unnamed_nodes():
+    engine = PatchEngine(
+        Part.LoadFromNode(
+            ConfigNode.FromText(
+                "PART { name = a\nMODULE { isEnabled = True }\n"
+                "MODULE { name = ModuleEngines } }\n"
+                "PART { name = b\nMODULE { isEnabled = True } }"
+            )
+        )
+    )
+    assert _apply(engine, "@PART[a] { @MODULE[ModuleEngines] { key = 1 } }") == 1
+    modules = _part(engine, "a").children
+    assert not modules[0].HasValue("key")
+    assert modules[1].GetValue("key") == "1"
+    assert _apply(engine, "@PART:HAS[@MODULE[ModuleEngines]] { tag = x }") == 1
+    assert _part(engine, "a").GetValue("tag") == "x"
+    assert not _part(engine, "b").HasValue("tag")
+    assert _apply(engine, "@PART:HAS[!MODULE[ModuleEngines]] { tag = y }") == 1
+    assert _part(engine, "b").GetValue("tag") == "y"
+
+
+def test_passes_and_needs():
+    engine = PatchEngine(
+        Part.LoadFromNode(ConfigNode.FromText("PART { name = a }")), mods=["Squad"]
+    )
+    _apply(
+        engine,
+        "@PART[a]:FINAL { tag = final }\n"
+        "@PART[a]:AFTER[Zeta] { tag = after_zeta }\n"
+        "@PART[a]:FOR[Zeta] { tag = for_zeta }\n"
+        "@PART[a]:LAST[Alpha] { tag = last_alpha }\n"
+        "@PART[a]:BEFORE[Alpha] { tag = before_alpha }\n"
+        "@PART[a] { tag = legacy }\n"
+        "@PART[a]:FIRST { tag = first }\n"
+        "@PART[a]:AFTER[Missing] { tag = missing }\n"
+        "@PART[a]:NEEDS[Squad,Zeta|Missing,!Missing] { tag = needs }\n"
+        "@PART[a]:NEEDS[Missing] { tag = needs_missing }\n"
+        "@PART[a]:FOR[Alpha]:NEEDS[!Squad] { tag = not_squad }",
+    )
+    tags = [v.value for v in _part(engine, "a").GetValues("tag")]
+    assert tags == [
+        "first",
+        "legacy",
+        "needs",
+        "before_alpha",
+        "for_zeta",
+        "after_zeta",
+        "last_alpha",
+        "final",
+    ]
+    assert engine.mods == {"squad", "zeta", "alpha"}
+
+
+def test_invalid_patches():
+    for text in (
+        "",
+        "@",
+        "@PART:FOR",
+        "@PART:FINAL[Mod]",
+        "@PART:FOR[A]:AFTER[B]",
+        "@PART:NEEDS[]",
+        "@PART:NEEDS[A,!]",
+    ):
+        with pytest.raises(PatchError):
+            Selector(text)
+    for text in (
+        "@PART { @MODULE:FOR[A] { } }",
+        "@PART { @ = 1 }",
+        "@PART { @ * = 2 }",
+    ):
+        with pytest.raises(PatchError):
+            _apply(_engine(), text)
+    engine = _engine()
+    assert _apply(engine, "@PART[engine] { @* = 2\n%tag+ = 1 }") == 1
+    assert _part(engine, "engine").GetValue("tag") == "1"
+    assert not _part(engine, "engine").HasValue("*")
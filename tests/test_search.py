@@ -0,0 +1,112 @@
+import re
+
+from KSPUtils.config_node_utils import ConfigNode, Part, PartIndex
+from KSPUtils.config_node_utils.search import MultiSelector, SearchQuery, SearchTerm
+from KSPUtils.config_node_utils.search.abstract_term import AbstractTerm
+from KSPUtils.config_node_utils.search.search_term import key_matcher, pattern_matcher
+
+PARTS = """
+PART { name = engine
+mass = 1.5
+MODULE { name = ModuleEngines
+PROPELLANT { name = LiquidFuel } }
+MODULE { name = ModuleGimbal } }
+PART { name = tank
+mass = 0.5
+RESOURCE { name = LiquidFuel
+amount = 100 } }
+PART { name = probe
+MODULE { name = ModuleCommand }
+MODULE { } }
+"""
+
+QUERIES = (
+    "",
+    "name:engine",
+    "^name:engine",
+    "mass",
+    "mass:0",
+    "PART/MODULE:ModuleEngines",
+    "PART/MODULE/name:ModuleGimbal",
+    "PART/MODULE:Module.*/PROPELLANT:LiquidFuel",
+    "PART/MODULE:Module.*/PROPELLANT/name:Liquid",
+    "PART:engine/MODULE/PROPELLANT/name:Liquid",
+    "/RESOURCE:LiquidFuel/amount:100",
+    "PART/RESOURCE/amount || PART/MODULE:ModuleCommand",
+    "^{PART/RESOURCE/amount || PART/MODULE:ModuleCommand}",
+    "name:tank || name:engine || name:probe && mass",
+    "{name:tank || name:engine} && ^mass:1 || ^{PART/MODULE/name && ^name:probe}",
+    "^{^mass && ^{PART/RESOURCE || name:e}}",
+)
+
+
+def test_compiled_query_matches_query():
+    parts = list(Part.LoadFromNode(ConfigNode.FromText(PARTS)))
+    for text in QUERIES:
+        query = SearchQuery.Parse(text)
+        match = query.compile()
+        # the compiled ANDs and ORs reorder their terms as they go
+        for _ in range(50):
+            assert [match(p) for p in parts] == [query.match(p) for p in parts], text
+
+
+def test_pattern_matcher_matches_regex():
+    strings = ("", "\n", "PART", "PART\n", "PARTS", "part", "MODULE", "ModuleEngines")
+    for pattern in (
+        "",
+        "$",
+        ".*",
+        "PART",
+        "PART$",
+        "PART.*",
+        "Mod",
+        "P.RT",
+        "(?i)part$",
+    ):
+        for matcher in (pattern_matcher, key_matcher):
+            match = matcher(pattern)
+            assert match is matcher(pattern)
+            for string in strings * 2:
+                expected = re.match(pattern, string) is not None
+                assert match(string) == expected, pattern
+
+
+def test_index_candidates():
+    index = PartIndex()
+    for part in Part.LoadFromNode(ConfigNode.FromText(PARTS)):
+        index.add(part)
+    for text in QUERIES + ("PART:t.*/mass", "PART/MODULE:ModuleGimbal$/name"):
+        query = SearchQuery.Parse(text)
+        candidates = query.candidates(index)
+        matches = [p for p in index if query.match(p)]
+        assert [p for p in candidates if query.match(p)] == matches, text
+    selective = SearchQuery.Parse("PART/MODULE:ModuleGimbal$/name && ^mass:1")
+    assert [p.name for p in selective.candidates(index)] == ["engine"]
+
+
+def test_multi_selector_matches_terms():
+    parts = list(Part.LoadFromNode(ConfigNode.FromText(PARTS)))
+    terms = [
+        SearchTerm(t)
+        for t in (
+            "",
+            "name",
+            "PART/",
+            "PART/MODULE/",
+            "PART/MODULE:Module.*/name",
+            "PART/MODULE:ModuleEngines/PROPELLANT/",
+            "PART//name:Liquid",
+            "PART/MODULE/",
+            "PART:tank/mass",
+        )
+    ]
+    selector = MultiSelector(terms)
+    for part in parts:
+        assert selector.select(part) == [t.select(part) for t in terms]
+
+
+def test_default_candidates_are_all_parts():
+    index = PartIndex()
+    for part in Part.LoadFromNode(ConfigNode.FromText(PARTS)):
+        index.add(part)
+    assert AbstractTerm().candidates(index) == index.parts